@@ -0,0 +1,67 @@
+"""Compare indented JSON with the binary session format.
+
+Run with ``python bench_binary_store.py [days] [sessions_per_day]``.
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from binary_store import BinaryStore, write_binary
+
+
+def synthetic(days, per_day):
+    rng = random.Random(1)
+    cats = ['Work', 'Study', 'Admin', 'Reading', '']
+    start = date(2020, 1, 1)
+    sessions = {}
+    for i in range(days):
+        d = start + timedelta(days=i)
+        sessions[d.isoformat()] = {
+            f'Task {rng.randrange(200)} #{j}': {
+                'elapsed': rng.randrange(60, 1500),
+                'timestamp': 1577836800.0 + i * 86400 + j * 1800,
+                'category': rng.choice(cats),
+                'notes': '',
+            }
+            for j in range(per_day)
+        }
+    return {'sessions_by_date': sessions, 'categories': {c: '#888888' for c in cats if c},
+            'tasks': [], 'theme': False}
+
+
+def main(days=365, per_day=12):
+    data = synthetic(days, per_day)
+    last = max(data['sessions_by_date'])
+    with tempfile.TemporaryDirectory() as tmp:
+        jpath = os.path.join(tmp, 'sessions.json')
+        bpath = os.path.join(tmp, 'sessions.pmdb')
+        with open(jpath, 'w') as f:
+            json.dump(data, f, indent=2)
+        write_binary(bpath, data)
+
+        t0 = time.perf_counter()
+        with open(jpath) as f:
+            json.load(f)['sessions_by_date'][last]
+        json_day = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        with BinaryStore(bpath) as store:
+            store.day(last)
+        bin_day = time.perf_counter() - t0
+
+        jsize = os.path.getsize(jpath)
+        bsize = os.path.getsize(bpath)
+    print(f'records:          {days * per_day}')
+    print(f'json size:        {jsize / 1024:.0f} KiB')
+    print(f'binary size:      {bsize / 1024:.0f} KiB ({jsize / bsize:.1f}x smaller)')
+    print(f'json one day:     {json_day * 1e3:.2f} ms')
+    print(f'binary one day:   {bin_day * 1e3:.2f} ms')
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 365, int(args[1]) if len(args) > 1 else 12)
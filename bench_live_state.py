@@ -0,0 +1,49 @@
+"""Measure how many consistent live-state reads per second a reader gets.
+
+Run with ``python bench_live_state.py [seconds]``. A writer thread keeps
+publishing while the main thread reads.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from live_state import LiveStateReader, LiveStateWriter
+
+
+def main(seconds=2.0):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'live.state')
+        writer = LiveStateWriter(path)
+        writer.publish('work', True, 1500, task='bench')
+        reader = LiveStateReader(path)
+        stop = threading.Event()
+        writes = 0
+
+        def write():
+            nonlocal writes
+            i = 0
+            while not stop.is_set():
+                i += 1
+                writer.publish('work' if i % 2 else 'break', True, 1500, pomo_count=i)
+                writes += 1
+                time.sleep(0.001)
+
+        thread = threading.Thread(target=write)
+        thread.start()
+        reads = 0
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            reader.read()
+            reads += 1
+        stop.set()
+        thread.join()
+        reader.close()
+        writer.close()
+    print(f'reads/s:  {reads / seconds:,.0f}')
+    print(f'writes/s: {writes / seconds:,.0f}')
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 2.0)
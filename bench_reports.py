@@ -0,0 +1,67 @@
+"""Time weekly report generation over synthetic users.
+
+Run with ``python bench_reports.py [users] [sessions_per_day]``. Charts
+are skipped if matplotlib is not installed.
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from reports import generate
+
+WEEK_END = date(2024, 5, 31)
+
+
+def make_user(root, name, per_day, rng):
+    data_dir = os.path.join(root, name, '.pomopad')
+    os.makedirs(data_dir)
+    cats = ['Work', 'Study', 'Admin', '']
+    for month_start in (date(2024, 4, 1), date(2024, 5, 1)):
+        sessions = {}
+        d = month_start
+        while d.month == month_start.month:
+            sessions[d.isoformat()] = {
+                f'Task {j}': {'elapsed': rng.randrange(300, 1500),
+                              'timestamp': 1714521600.0 + j * 1800,
+                              'category': rng.choice(cats), 'notes': ''}
+                for j in range(per_day)
+            }
+            d += timedelta(days=1)
+        with open(os.path.join(data_dir, f'sessions_{month_start:%Y-%m}.json'), 'w') as f:
+            json.dump({'sessions_by_date': sessions, 'categories': {}, 'tasks': [], 'theme': False},
+                      f, indent=2)
+    return os.path.join(root, name)
+
+
+def run(users, out, workers, chart):
+    t0 = time.perf_counter()
+    for _, _, error in generate(users, out, WEEK_END, workers, chart):
+        if error:
+            raise error
+    return time.perf_counter() - t0
+
+
+def main(count=64, per_day=40):
+    try:
+        import matplotlib  # noqa: F401
+        chart = True
+    except ImportError:
+        chart = False
+    rng = random.Random(1)
+    cores = os.cpu_count() or 1
+    with tempfile.TemporaryDirectory() as tmp:
+        users = [make_user(tmp, f'user{i:03d}', per_day, rng) for i in range(count)]
+        serial = run(users, os.path.join(tmp, 'out1'), 1, chart)
+        parallel = run(users, os.path.join(tmp, 'outN'), cores, chart)
+    print(f'users:      {count} (charts {"on" if chart else "off"})')
+    print(f'1 worker:   {serial:.2f} s ({count / serial:.1f} users/s)')
+    print(f'{cores} workers:  {parallel:.2f} s ({count / parallel:.1f} users/s)')
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 64, int(args[1]) if len(args) > 1 else 40)
@@ -0,0 +1,77 @@
+"""Migrate a large version 1 history and report time and peak memory.
+
+Run with ``python bench_schema.py [records]`` (default one million). The
+legacy file is written a day at a time, so the benchmark itself never
+holds the whole history. Timing and peak memory come from separate
+passes, for the streaming migration and for ``json.load`` followed by
+``schema.upgrade``.
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+import schema
+
+PER_DAY = 20
+
+
+def write_legacy(path, records):
+    """Write a v1 file: task sessions lack ``category``, theme is a name."""
+    rng = random.Random(1)
+    cats = ['Work', 'Study', 'Admin', 'Reading']
+    start = date(2000, 1, 1)
+    with open(path, 'w') as f:
+        f.write('{"sessions_by_date": {')
+        for i in range(0, records, PER_DAY):
+            day = start + timedelta(days=i // PER_DAY)
+            sessions = {}
+            for j in range(min(PER_DAY, records - i)):
+                entry = {'elapsed': rng.randrange(60, 1500),
+                         'timestamp': 946684800 + i * 4320 + j * 1800, 'notes': ''}
+                if j % 3:
+                    entry['category'] = rng.choice(cats)
+                sessions[f'Task {rng.randrange(500)} #{j}'] = entry
+            f.write((', ' if i else '') + json.dumps(day.isoformat()) + ': ' + json.dumps(sessions))
+        f.write('}, "categories": {"Work": "#ff0000"}, "tasks": [], "theme": "superhero"}')
+
+
+def _measure(fn):
+    """Return ``(result, seconds, peak bytes)``; tracing would skew the timing."""
+    t0 = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(records=1_000_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        src = os.path.join(tmp, 'sessions_v1.json')
+        dst = os.path.join(tmp, 'sessions_v2.json')
+        write_legacy(src, records)
+        size = os.path.getsize(src)
+
+        count, stream_time, stream_peak = _measure(lambda: schema.migrate(src, dst))
+
+        def whole():
+            with open(src) as f:
+                return len(schema.upgrade(json.load(f))['sessions_by_date'])
+        _, whole_time, whole_peak = _measure(whole)
+
+    print(f'records:            {count}')
+    print(f'file size:          {size / 2**20:.0f} MiB')
+    print(f'streaming migrate:  {stream_time:.1f} s, peak {stream_peak / 2**20:.1f} MiB')
+    print(f'json.load+upgrade:  {whole_time:.1f} s, peak {whole_peak / 2**20:.0f} MiB')
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 1_000_000)
@@ -0,0 +1,70 @@
+"""Benchmark TimerBank with many concurrent timers on a simulated clock.
+
+Run with ``python bench_timer_bank.py [timers] [hours]``.
+"""
+import random
+import sys
+import time
+
+from timer_bank import TimerBank
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def main(timers=10_000, hours=8.0):
+    clock = FakeClock()
+    bank = TimerBank(clock=clock)
+    rng = random.Random(1)
+
+    t0 = time.perf_counter()
+    ids = [bank.add() for _ in range(timers)]
+    for tid in ids:
+        bank.start(tid, now=rng.uniform(0, 25 * 60))
+    setup = time.perf_counter() - t0
+
+    events = 0
+    wakeups = 0
+
+    def on_event(tid, event):
+        nonlocal events
+        events += 1
+
+    real_sleep = clock.sleep
+
+    def counting_sleep(seconds):
+        nonlocal wakeups
+        wakeups += 1
+        real_sleep(seconds)
+
+    cpu0 = time.process_time()
+    bank.run(on_event, sleep=counting_sleep, until=hours * 3600)
+    cpu = time.process_time() - cpu0
+
+    t0 = time.perf_counter()
+    for tid in ids:
+        bank.remaining(tid)
+    query = time.perf_counter() - t0
+
+    simulated = hours * 3600
+    print(f"timers:            {timers}")
+    print(f"setup:             {setup * 1e3:.1f} ms")
+    print(f"simulated time:    {hours:.1f} h")
+    print(f"transitions:       {events}")
+    print(f"wakeups:           {wakeups}")
+    print(f"cpu for run:       {cpu:.3f} s ({cpu / simulated * 100:.5f}% of one core)")
+    print(f"per transition:    {cpu / max(events, 1) * 1e6:.1f} us")
+    print(f"remaining() x all: {query * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 10_000, float(args[1]) if len(args) > 1 else 8.0)
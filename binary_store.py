@@ -0,0 +1,204 @@
+"""Compact binary session files.
+
+Layout (little endian)::
+
+    header   magic, version, day count, string count, meta string,
+             string offsets position, string blob position
+    days     one entry per date: year, month, day, first record, record count
+    records  fixed width: name, category, notes, color, extra, elapsed, timestamp
+    strings  offset table followed by a UTF-8 blob
+
+All text is interned in the string table and records refer to it by
+index. Fields that do not fit the fixed record (intervals, unknown keys)
+are kept as a JSON string in ``extra``. Readers memory-map the file and
+only decode the days they are asked for.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+
+MAGIC = b"PMDB"
+VERSION = 1
+NONE = 0xFFFFFFFF
+
+HEADER = struct.Struct("<4sHHIIIII")
+DAY = struct.Struct("<HBBII")
+RECORD = struct.Struct("<IIIIIId")
+OFFSET = struct.Struct("<I")
+
+_FIXED = ("category", "notes", "color", "elapsed", "timestamp")
+
+
+class _Strings:
+    def __init__(self):
+        self.index = {}
+        self.values = []
+
+    def intern(self, value):
+        if value is None:
+            return NONE
+        idx = self.index.get(value)
+        if idx is None:
+            idx = self.index[value] = len(self.values)
+            self.values.append(value)
+        return idx
+
+
+def encode(data):
+    """Return a ``load_sessions`` style dict as binary file contents."""
+    strings = _Strings()
+    meta = {k: v for k, v in data.items() if k != "sessions_by_date"}
+    meta_idx = strings.intern(json.dumps(meta))
+
+    days = []
+    records = []
+    for date_key in sorted(data.get("sessions_by_date", {})):
+        sessions = data["sessions_by_date"][date_key]
+        year, month, day = (int(p) for p in date_key.split("-"))
+        days.append(DAY.pack(year, month, day, len(records), len(sessions)))
+        for name, s in sessions.items():
+            extra = {k: v for k, v in s.items() if k not in _FIXED}
+            ts = s.get("timestamp")
+            records.append(RECORD.pack(
+                strings.intern(name),
+                strings.intern(s["category"]) if "category" in s else NONE,
+                strings.intern(s["notes"]) if "notes" in s else NONE,
+                strings.intern(s["color"]) if "color" in s else NONE,
+                strings.intern(json.dumps(extra)) if extra else NONE,
+                int(s.get("elapsed", 0)),
+                math.nan if ts is None else float(ts),
+            ))
+
+    encoded = [v.encode("utf-8") for v in strings.values]
+    offsets_pos = HEADER.size + DAY.size * len(days) + RECORD.size * len(records)
+    blob_pos = offsets_pos + OFFSET.size * (len(encoded) + 1)
+    offsets = []
+    pos = 0
+    for b in encoded:
+        offsets.append(OFFSET.pack(pos))
+        pos += len(b)
+    offsets.append(OFFSET.pack(pos))
+
+    header = HEADER.pack(MAGIC, VERSION, 0, len(days), len(encoded),
+                         meta_idx, offsets_pos, blob_pos)
+    return b"".join([header, *days, *records, *offsets, *encoded])
+
+
+def write_binary(path, data):
+    """Write a ``load_sessions`` style dict to ``path``."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(encode(data))
+    os.replace(tmp, path)
+
+
+class BinaryStore:
+    """Read-only memory-mapped view of a binary session file."""
+
+    def __init__(self, path=None, buffer=None):
+        self._file = None
+        if buffer is not None:
+            self._map = buffer
+        else:
+            self._file = open(path, "rb")
+            try:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                self._file.close()
+                raise ValueError(f"{path} is empty")
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path or 'buffer'} is truncated")
+        (magic, version, _, self._day_count, self._string_count, self._meta_idx,
+         self._offsets_pos, self._blob_pos) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path or 'buffer'} is not a version {VERSION} session file")
+        self._records_pos = HEADER.size + DAY.size * self._day_count
+        self._strings = {}
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Read a session file already held in memory."""
+        return cls(buffer=data)
+
+    def close(self):
+        if self._file is not None:
+            self._map.close()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _string(self, idx):
+        if idx == NONE:
+            return None
+        value = self._strings.get(idx)
+        if value is None:
+            start, end = struct.unpack_from("<II", self._map, self._offsets_pos + OFFSET.size * idx)
+            value = self._map[self._blob_pos + start:self._blob_pos + end].decode("utf-8")
+            self._strings[idx] = value
+        return value
+
+    def meta(self):
+        return json.loads(self._string(self._meta_idx))
+
+    def _day_entry(self, i):
+        year, month, day, first, count = DAY.unpack_from(self._map, HEADER.size + DAY.size * i)
+        return (year, month, day), first, count
+
+    def _find(self, date_key):
+        # the day index is sorted, so binary search it in place
+        target = tuple(int(p) for p in date_key.split("-"))
+        lo, hi = 0, self._day_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._day_entry(mid)[0] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def days(self):
+        return ["%04d-%02d-%02d" % self._day_entry(i)[0] for i in range(self._day_count)]
+
+    def day(self, date_key):
+        """Decode the sessions recorded on ``date_key``."""
+        i = self._find(date_key)
+        if i == self._day_count:
+            return {}
+        key, first, count = self._day_entry(i)
+        if "%04d-%02d-%02d" % key != date_key:
+            return {}
+        sessions = {}
+        pos = self._records_pos + RECORD.size * first
+        for name, cat, notes, color, extra, elapsed, ts in RECORD.iter_unpack(
+                self._map[pos:pos + RECORD.size * count]):
+            entry = {"elapsed": elapsed, "timestamp": None if math.isnan(ts) else ts}
+            for key, idx in (("category", cat), ("notes", notes), ("color", color)):
+                if idx != NONE:
+                    entry[key] = self._string(idx)
+            if extra != NONE:
+                entry.update(json.loads(self._string(extra)))
+            sessions[self._string(name)] = entry
+        return sessions
+
+    def range(self, start, end):
+        result = {}
+        for i in range(self._find(start), self._day_count):
+            key = "%04d-%02d-%02d" % self._day_entry(i)[0]
+            if key > end:
+                break
+            result[key] = self.day(key)
+        return result
+
+    def load(self):
+        """Decode the whole file into a ``load_sessions`` style dict."""
+        data = self.meta()
+        data["sessions_by_date"] = {d: self.day(d) for d in self.days()}
+        return data
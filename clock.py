@@ -0,0 +1,33 @@
+"""Clocks that timer code can be given instead of calling ``time`` directly."""
+import time
+
+
+class SystemClock:
+    """Real wall and monotonic time."""
+
+    def time(self):
+        return time.time()
+
+    def monotonic(self):
+        return time.monotonic()
+
+
+class VirtualClock:
+    """A clock that only moves when told to, for tests and soak runs."""
+
+    def __init__(self, start=1_700_000_000.0):
+        self._wall = start
+        self._mono = 0.0
+
+    def time(self):
+        return self._wall
+
+    def monotonic(self):
+        return self._mono
+
+    def advance(self, seconds):
+        self._wall += seconds
+        self._mono += seconds
+
+
+SYSTEM_CLOCK = SystemClock()
@@ -0,0 +1,227 @@
+"""Helpers for several FocusBar instances sharing one data directory.
+
+``file_lock`` serialises writers, ``FileWatcher`` tells an instance that
+another one has written a file, and ``diff_sessions``/``apply_diff`` let it
+fold in just the records that changed.
+"""
+from contextlib import contextmanager
+import ctypes
+import ctypes.util
+import os
+import struct
+import sys
+import threading
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive advisory lock on ``path + '.lock'``."""
+    fd = os.open(path + '.lock', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if sys.platform == 'win32':
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == 'win32':
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_NONBLOCK = 0o4000
+_EVENT = struct.Struct('iIII')
+
+
+def _inotify():
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class FileWatcher:
+    """Report writes to files in a directory made by other processes.
+
+    Uses inotify on Linux and falls back to comparing ``os.stat`` results.
+    ``changed`` never blocks, so it can be polled from a Tk ``after`` loop.
+    Writes this process makes inside :meth:`own_write` are not reported.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self._writing = threading.Lock()
+        libc = _inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(_IN_NONBLOCK)
+            if fd >= 0:
+                directory = os.path.dirname(path) or '.'
+                if libc.inotify_add_watch(fd, os.fsencode(directory),
+                                          _IN_CLOSE_WRITE | _IN_MOVED_TO) >= 0:
+                    self._fd = fd
+                else:
+                    os.close(fd)
+        self._stat = self._signature()
+
+    @property
+    def backend(self):
+        return 'inotify' if self._fd is not None else 'poll'
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _drain(self):
+        name = os.fsencode(os.path.basename(self.path))
+        hit = False
+        while True:
+            try:
+                buf = os.read(self._fd, 4096)
+            except BlockingIOError:
+                return hit
+            pos = 0
+            while pos < len(buf):
+                _, _, _, length = _EVENT.unpack_from(buf, pos)
+                pos += _EVENT.size
+                if buf[pos:pos + length].rstrip(b'\0') == name:
+                    hit = True
+                pos += length
+
+    def changed(self):
+        """Return True if the file changed since the last call or ``mark_seen``."""
+        # while one of our own writes is in flight, report on the next poll
+        if not self._writing.acquire(blocking=False):
+            return False
+        try:
+            if self._fd is not None and not self._drain():
+                return False
+            sig = self._signature()
+            if sig == self._stat:
+                return False
+            self._stat = sig
+            return True
+        finally:
+            self._writing.release()
+
+    @contextmanager
+    def own_write(self, path=None):
+        """Wrap a write by this process, from any thread, so it is not reported.
+
+        ``path`` retargets the watcher, e.g. when the write went to a new
+        month's file.
+        """
+        with self._writing:
+            yield
+            if path is not None:
+                self.path = path
+            self.mark_seen()
+
+    def mark_seen(self):
+        """Forget pending notifications, e.g. after this process wrote the file."""
+        if self._fd is not None:
+            self._drain()
+        self._stat = self._signature()
+
+    def retarget(self, path):
+        """Watch a different file in the same directory (month rollover)."""
+        self.path = path
+        self._stat = self._signature()
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def diff_sessions(old, new):
+    """Return ``(upserts, removals)`` turning ``old`` into ``new``.
+
+    ``upserts`` is ``{date: {name: entry}}``; ``removals`` is a list of
+    ``(date, name)`` pairs.
+    """
+    upserts = {}
+    removals = []
+    for date, sessions in new.items():
+        before = old.get(date, {})
+        for name, entry in sessions.items():
+            if before.get(name) != entry:
+                upserts.setdefault(date, {})[name] = entry
+    for date, sessions in old.items():
+        after = new.get(date, {})
+        for name in sessions:
+            if name not in after:
+                removals.append((date, name))
+    return upserts, removals
+
+
+def apply_diff(sessions_by_date, upserts, removals):
+    """Apply a diff from :func:`diff_sessions` in place."""
+    for date, name in removals:
+        day = sessions_by_date.get(date)
+        if day is not None:
+            day.pop(name, None)
+            if not day:
+                del sessions_by_date[date]
+    for date, sessions in upserts.items():
+        sessions_by_date.setdefault(date, {}).update(sessions)
+
+
+def _merge_keyed(base, ours, theirs):
+    """Per-key three-way merge of two dicts; our edits and removals win."""
+    merged = dict(theirs)
+    for key, value in ours.items():
+        if base.get(key) != value:
+            merged[key] = value
+    for key in base:
+        if key not in ours:
+            merged.pop(key, None)
+    return merged
+
+
+def _task_key(task):
+    return task.get('id') or task.get('name')
+
+
+def merge(base, ours, theirs):
+    """Three-way merge of two month dicts that both started from ``base``.
+
+    Session records, categories and tasks merge per key. Any other key
+    takes our value only if we changed it since ``base``, so a writer
+    holding a stale copy of, say, the ``sync`` metadata never puts it
+    back. Returns a new dict and leaves the inputs untouched.
+    """
+    merged = dict(theirs)
+    for key, value in ours.items():
+        if key not in theirs or base.get(key) != value:
+            merged[key] = value
+    sessions = {d: dict(s) for d, s in theirs.get('sessions_by_date', {}).items()}
+    apply_diff(sessions, *diff_sessions(base.get('sessions_by_date', {}),
+                                        ours.get('sessions_by_date', {})))
+    merged['sessions_by_date'] = sessions
+    merged['categories'] = _merge_keyed(base.get('categories', {}),
+                                        ours.get('categories', {}),
+                                        theirs.get('categories', {}))
+    tasks = [{_task_key(t): t for t in side.get('tasks', [])} for side in (base, ours, theirs)]
+    merged['tasks'] = list(_merge_keyed(*tasks).values())
+    return merged
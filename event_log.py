@@ -0,0 +1,118 @@
+import os
+import struct
+import time
+from typing import NamedTuple
+
+START = 0
+PAUSE = 1
+RESUME = 2
+PHASE = 3
+RESET = 4
+
+MODES = ("work", "break")
+
+# kind, mode index, pomo_count, monotonic seconds, wall-clock seconds
+RECORD = struct.Struct("<BBHdd")
+
+
+class Event(NamedTuple):
+    kind: int
+    mode: str
+    pomo_count: int
+    monotonic: float
+    wall: float
+
+
+class EventLog:
+    """Append-only log of timer events stored as fixed-width binary records."""
+
+    def __init__(self, data: bytes = b""):
+        if len(data) % RECORD.size:
+            raise ValueError("truncated event log")
+        self._buf = bytearray(data)
+        self._file = None
+
+    @classmethod
+    def open(cls, path) -> "EventLog":
+        """Load the log stored at ``path`` and append new events to it."""
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        whole = len(data) - len(data) % RECORD.size
+        if whole != len(data):
+            # a crash mid-append leaves a partial record at the end
+            os.truncate(path, whole)
+        log = cls(data[:whole])
+        log._file = open(path, "ab")
+        return log
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def append(self, kind: int, mode: str, pomo_count: int,
+               monotonic: float = None, wall: float = None) -> Event:
+        if monotonic is None:
+            monotonic = time.monotonic()
+        if wall is None:
+            wall = time.time()
+        record = RECORD.pack(kind, MODES.index(mode), pomo_count & 0xFFFF, monotonic, wall)
+        self._buf += record
+        if self._file is not None:
+            self._file.write(record)
+            self._file.flush()
+        return Event(kind, mode, pomo_count, monotonic, wall)
+
+    def __len__(self):
+        return len(self._buf) // RECORD.size
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("event index out of range")
+        kind, mode, count, mono, wall = RECORD.unpack_from(self._buf, index * RECORD.size)
+        return Event(kind, MODES[mode], count, mono, wall)
+
+    def __iter__(self):
+        for kind, mode, count, mono, wall in RECORD.iter_unpack(self._buf):
+            yield Event(kind, MODES[mode], count, mono, wall)
+
+    def events(self, start: int = 0):
+        """Yield events from index ``start`` onwards."""
+        view = memoryview(self._buf)[start * RECORD.size:]
+        for kind, mode, count, mono, wall in RECORD.iter_unpack(view):
+            yield Event(kind, MODES[mode], count, mono, wall)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self._buf)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "EventLog":
+        return cls(data)
+
+    def intervals(self, mode: str = "work", start: int = 0):
+        """Return ``(wall_start, wall_end)`` pairs spent running in ``mode``.
+
+        Durations come from the monotonic timestamps so wall-clock jumps
+        during a segment do not stretch or shrink it.
+        """
+        result = []
+        open_event = None
+        for ev in self.events(start):
+            if open_event is not None and ev.kind in (PAUSE, RESET, PHASE):
+                if open_event.mode == mode:
+                    duration = max(0.0, ev.monotonic - open_event.monotonic)
+                    result.append((open_event.wall, open_event.wall + duration))
+                open_event = None
+                if ev.kind == PHASE:
+                    open_event = ev
+            elif ev.kind in (START, RESUME):
+                open_event = ev
+        return result
+
+    def focused_seconds(self, start: int = 0) -> float:
+        return sum(end - begin for begin, end in self.intervals("work", start))
@@ -0,0 +1,153 @@
+"""Undo/redo made of inverse deltas rather than snapshots.
+
+A :class:`Change` only remembers the values it replaced, so undoing or
+redoing it costs time and memory proportional to the edit, not to the
+history size. :class:`UndoStack` drops the oldest changes once their
+estimated footprint exceeds a budget.
+"""
+from collections import deque
+import sys
+
+# rough per-item costs used for the memory budget
+_ITEM_BYTES = 72
+_KEY_BYTES = 56
+
+
+def _value_bytes(value):
+    """Rough footprint of a retained value, e.g. a record with notes or interval lists."""
+    if isinstance(value, dict):
+        return sum(_KEY_BYTES + _value_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_ITEM_BYTES + _value_bytes(v) for v in value)
+    return 0 if value is None else sys.getsizeof(value)
+
+
+def _set_session(sessions_by_date, date, name, value):
+    if value is None:
+        day = sessions_by_date.get(date)
+        if day is not None:
+            day.pop(name, None)
+            if not day:
+                del sessions_by_date[date]
+    else:
+        sessions_by_date.setdefault(date, {})[name] = value
+
+
+class Change:
+    """One reversible edit.
+
+    ``sessions`` holds ``(date, name, before, after)`` record values and
+    ``categories`` holds ``(name, before, after)`` colours; ``None`` means
+    absent. ``fields`` holds ``(field, before, after, keys)`` for the same
+    field rewritten on many records, e.g. a category rename.
+    """
+
+    __slots__ = ('label', 'sessions', 'categories', 'fields', '_size')
+
+    def __init__(self, label):
+        self.label = label
+        self.sessions = []
+        self.categories = []
+        self.fields = []
+        self._size = None
+
+    def session(self, date, name, before, after):
+        self.sessions.append((date, name, before, after))
+        return self
+
+    def category(self, name, before, after):
+        self.categories.append((name, before, after))
+        return self
+
+    def field(self, field, before, after, keys):
+        self.fields.append((field, before, after, tuple(keys)))
+        return self
+
+    def size(self):
+        # measured once, when recorded, so later edits to a retained record
+        # cannot unbalance the stack's running total
+        if self._size is None:
+            values = [v for s in self.sessions for v in s[2:]]
+            values += [v for c in self.categories for v in c[1:]]
+            values += [v for f in self.fields for v in f[1:3]]
+            self._size = (
+                _ITEM_BYTES * (1 + len(self.sessions) + len(self.categories) + len(self.fields))
+                + _KEY_BYTES * sum(len(f[3]) for f in self.fields)
+                + sum(map(_value_bytes, values)))
+        return self._size
+
+    def _apply(self, sessions_by_date, categories, forward):
+        touched = []
+        fields = self.fields if forward else reversed(self.fields)
+        for field, before, after, keys in fields:
+            value = after if forward else before
+            for date, name in keys:
+                entry = sessions_by_date.get(date, {}).get(name)
+                if entry is not None:
+                    entry[field] = value
+                    touched.append((date, name))
+        items = self.sessions if forward else reversed(self.sessions)
+        for date, name, before, after in items:
+            _set_session(sessions_by_date, date, name, after if forward else before)
+            touched.append((date, name))
+        cats = self.categories if forward else reversed(self.categories)
+        for name, before, after in cats:
+            value = after if forward else before
+            if value is None:
+                categories.pop(name, None)
+            else:
+                categories[name] = value
+        return touched
+
+    def undo(self, sessions_by_date, categories):
+        """Revert the change; return the ``(date, name)`` records it touched."""
+        return self._apply(sessions_by_date, categories, False)
+
+    def redo(self, sessions_by_date, categories):
+        return self._apply(sessions_by_date, categories, True)
+
+
+class UndoStack:
+    """Undo and redo stacks bounded by an approximate memory budget."""
+
+    def __init__(self, budget=256 * 1024):
+        self.budget = budget
+        self._undo = deque()
+        self._redo = []
+        self._used = 0
+
+    def __len__(self):
+        return len(self._undo)
+
+    @property
+    def can_undo(self):
+        return bool(self._undo)
+
+    @property
+    def can_redo(self):
+        return bool(self._redo)
+
+    def record(self, change):
+        """Remember a change that has already been applied."""
+        self._undo.append(change)
+        self._used += change.size()
+        for old in self._redo:
+            self._used -= old.size()
+        self._redo.clear()
+        while self._used > self.budget and len(self._undo) > 1:
+            self._used -= self._undo.popleft().size()
+
+    def undo(self, sessions_by_date, categories):
+        """Undo the last change; return it with the records it touched."""
+        if not self._undo:
+            return None, []
+        change = self._undo.pop()
+        self._redo.append(change)
+        return change, change.undo(sessions_by_date, categories)
+
+    def redo(self, sessions_by_date, categories):
+        if not self._redo:
+            return None, []
+        change = self._redo.pop()
+        self._undo.append(change)
+        return change, change.redo(sessions_by_date, categories)
@@ -0,0 +1,140 @@
+"""Live timer state in a small memory-mapped file for status bars.
+
+The writer (the running app) keeps the page current; readers such as
+polybar, tmux or i3blocks scripts map the same file and read it without
+talking to the app. A sequence counter works as a seqlock: the writer
+makes it odd while updating and even when done, and readers retry if it
+was odd or changed under them. The Tk and web front ends may both write
+the same page, so writers hold a lock file while updating and advance
+the counter stored in the page, never a copy of their own.
+
+Run ``python live_state.py`` to print a one-line status, e.g.
+``🍅 12:34 Write report``.
+"""
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import NamedTuple
+
+from coordination import file_lock
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.pomopad', 'live.state')
+
+SEQ = struct.Struct('<I')
+# mode, running, pomo_count, streak, deadline (wall clock), remaining, task
+BODY = struct.Struct('<BBHHxxdi64s')
+SIZE = SEQ.size + BODY.size
+
+_MODES = ('work', 'break')
+
+
+class LiveState(NamedTuple):
+    mode: str
+    running: bool
+    pomo_count: int
+    streak: int
+    deadline: float
+    paused_remaining: int
+    task: str
+
+    def remaining(self, now=None):
+        """Seconds left in the current phase."""
+        if not self.running:
+            return self.paused_remaining
+        now = time.time() if now is None else now
+        return max(0, int(self.deadline - now + 0.999))
+
+
+def _encode_task(task):
+    raw = task.encode('utf-8')[:64]
+    # do not cut a multi-byte character in half
+    return raw.decode('utf-8', 'ignore').encode('utf-8')
+
+
+class LiveStateWriter:
+    def __init__(self, path=DEFAULT_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != SIZE:
+                os.ftruncate(fd, SIZE)
+            self._map = mmap.mmap(fd, SIZE)
+        finally:
+            os.close(fd)
+        self._last = None
+
+    def publish(self, mode, running, remaining, pomo_count=0, streak=0, task='', now=None):
+        """Write a new state; unchanged states are skipped."""
+        now = time.time() if now is None else now
+        key = (mode, running, pomo_count, streak, task, None if running else remaining)
+        if key == self._last:
+            return False
+        self._last = key
+        body = BODY.pack(_MODES.index(mode), running, pomo_count & 0xFFFF, streak & 0xFFFF,
+                         now + remaining if running else 0.0, remaining, _encode_task(task))
+        with file_lock(self.path):
+            # odd while the body is being rewritten, even once it is
+            # consistent; a count left odd by a crashed writer stays odd
+            seq = SEQ.unpack_from(self._map, 0)[0] | 1
+            SEQ.pack_into(self._map, 0, seq)
+            self._map[SEQ.size:SIZE] = body
+            SEQ.pack_into(self._map, 0, (seq + 1) & 0xFFFFFFFF)
+        return True
+
+    def publish_model(self, model, streak=0, task=''):
+        s = model.state
+        return self.publish(s.mode, s.running, s.remaining, model.pomo_count, streak, task)
+
+    def close(self):
+        self._map.close()
+
+
+class LiveStateReader:
+    def __init__(self, path=DEFAULT_PATH):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), SIZE, access=mmap.ACCESS_READ)
+
+    def read(self, retries=1000):
+        """Return a consistent :class:`LiveState` snapshot."""
+        m = self._map
+        for _ in range(retries):
+            before = SEQ.unpack_from(m, 0)[0]
+            if before & 1:
+                continue
+            body = m[SEQ.size:SIZE]
+            if SEQ.unpack_from(m, 0)[0] == before:
+                mode, running, count, streak, deadline, remaining, task = BODY.unpack(body)
+                return LiveState(_MODES[mode], bool(running), count, streak, deadline,
+                                 remaining, task.rstrip(b'\0').decode('utf-8', 'ignore'))
+        raise TimeoutError('live state is being rewritten continuously')
+
+    def close(self):
+        self._map.close()
+
+
+def format_status(state, now=None):
+    m, s = divmod(state.remaining(now), 60)
+    icon = '\U0001F345' if state.mode == 'work' else '☕'
+    pause = '' if state.running else ' ⏸'
+    task = f' {state.task}' if state.task else ''
+    return f'{icon} {m:02d}:{s:02d}{pause}{task}'
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    path = argv[0] if argv else DEFAULT_PATH
+    try:
+        reader = LiveStateReader(path)
+    except (OSError, ValueError):
+        print('\U0001F345 --:--')
+        return 1
+    print(format_status(reader.read()))
+    reader.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""Asynchronous notification dispatch.
+
+Timer events are queued with :meth:`Dispatcher.notify`, which never
+blocks; a worker thread hands each notification to the registered sinks.
+A sink is any callable taking a :class:`Notification`. Anything that
+touches Tk (toasts, flashing) stays on the UI thread and is not a sink.
+"""
+import json
+import math
+import queue
+import shutil
+import struct
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from typing import NamedTuple
+
+
+class Notification(NamedTuple):
+    event: str
+    title: str
+    message: str
+    timestamp: float
+
+
+class Dispatcher:
+    """Bounded queue of notifications drained by one worker thread."""
+
+    def __init__(self, sinks=(), maxsize=32):
+        self.sinks = list(sinks)
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize)
+        self._thread = None
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='pomopad-notify', daemon=True)
+            self._thread.start()
+        return self
+
+    def notify(self, event, title, message=''):
+        """Queue a notification; drop the oldest one if the queue is full."""
+        item = Notification(event, title, message, time.time())
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            for sink in list(self.sinks):
+                try:
+                    sink(item)
+                except Exception:
+                    pass
+
+    def close(self, timeout=1.0):
+        if self._thread is not None:
+            # make room for the sentinel rather than block the caller
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                self._queue.get_nowait()
+                self._queue.put_nowait(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+
+def sound_available():
+    """True if :class:`SoundSink` can play here.
+
+    Without simpleaudio a Tk front end rings its own bell instead, on the
+    UI thread, so an alert is never silent.
+    """
+    if sys.platform == 'win32':
+        return True
+    try:
+        import simpleaudio  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class SoundSink:
+    """Short beep: winsound on Windows, simpleaudio elsewhere."""
+
+    def __init__(self, freq=880, duration=0.2, rate=44100):
+        self.rate = rate
+        count = int(rate * duration)
+        self._audio = b''.join(
+            struct.pack('<h', int(math.sin(2 * math.pi * freq * t / rate) * 32767 * 0.3))
+            for t in range(count)
+        )
+
+    def __call__(self, note):
+        if sys.platform == 'win32':
+            import winsound
+            winsound.MessageBeep()
+        else:
+            import simpleaudio as sa
+            sa.play_buffer(self._audio, 1, 2, self.rate)
+
+
+class DesktopSink:
+    """Desktop notification via ``notify-send`` (the freedesktop D-Bus service).
+
+    ``send`` can be replaced with any callable taking ``(title, message)``,
+    e.g. a local stand-in when no notification daemon is running.
+    """
+
+    def __init__(self, send=None):
+        if send is None and shutil.which('notify-send'):
+            send = self._notify_send
+        self.send = send
+
+    @staticmethod
+    def _notify_send(title, message):
+        subprocess.run(['notify-send', '--app-name=FocusBar', title, message],
+                       timeout=5, check=False)
+
+    def __call__(self, note):
+        if self.send is not None:
+            self.send(note.title, note.message)
+
+
+class WebhookSink:
+    """POST each notification as JSON to a (local) URL."""
+
+    def __init__(self, url, timeout=2.0):
+        self.url = url
+        self.timeout = timeout
+
+    def __call__(self, note):
+        body = json.dumps(note._asdict()).encode()
+        req = urllib.request.Request(self.url, data=body,
+                                     headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.timeout):
+            pass
+
+
+def default_dispatcher(webhook_url=None):
+    """Return a started dispatcher with sound, desktop and optional webhook sinks."""
+    sinks = [SoundSink(), DesktopSink()] if sound_available() else [DesktopSink()]
+    if webhook_url:
+        sinks.append(WebhookSink(webhook_url))
+    return Dispatcher(sinks).start()
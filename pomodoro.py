@@ -4,6 +4,7 @@ import time
 import sys
 from datetime import datetime, timedelta
 import ctypes
+import math
 import os
 from PIL import Image, ImageTk
 
@@ -13,8 +14,23 @@ try:
 except Exception:
     DARK = False
 
-from storage import load_sessions, save_sessions
+from storage import (
+    compact_history,
+    current_file,
+    open_events,
+    open_tasks,
+)
+from coordination import FileWatcher, apply_diff
+from notifications import default_dispatcher, sound_available
+from history import Change, UndoStack
+from live_state import DEFAULT_PATH as LIVE_PATH, LiveStateWriter
+from query import HistorySource, QueryEngine
 import hashlib
+import queue
+from storage_service import StorageThread, snapshot
+from clock import SYSTEM_CLOCK
+from event_log import PHASE
+from task_store import TaskStore
 from timer_model import (
     TimerModel,
     WORK_DURATION,
@@ -25,6 +41,7 @@ from ui_analytics import (
     setup as analytics_setup,
     refresh as analytics_refresh,
     show_stats,
+    window as analytics_window,
 )
 from ui_sessions import SessionsPane
 
@@ -85,22 +102,61 @@ class TaskDialog(tk.Toplevel):
         self.done_var = tk.BooleanVar(value=task.get('done', False) if task else False)
         ttk.Checkbutton(self, text='Done', variable=self.done_var).grid(row=2, column=1, sticky='w')
 
-        ttk.Button(self, text='Save', command=self._on_save).grid(row=3, column=0, columnspan=2, pady=5)
+        ttk.Label(self, text='Priority:').grid(row=3, column=0, sticky='e')
+        self.priority_var = tk.IntVar(value=task.get('priority', 0) if task else 0)
+        ttk.Spinbox(self, from_=0, to=9, width=4, textvariable=self.priority_var).grid(
+            row=3, column=1, sticky='w', padx=5, pady=2)
+
+        ttk.Button(self, text='Save', command=self._on_save).grid(row=4, column=0, columnspan=2, pady=5)
 
     def _on_save(self):
         self.result = {
             'name': self.name_entry.get(),
             'note': self.notes.get('1.0', tk.END).strip(),
             'done': self.done_var.get(),
+            'priority': self.priority_var.get(),
         }
         self.destroy()
 
+def _apply_delta(data, upserts, removals, colours):
+    """Apply an undo or redo step to the storage service's month dict."""
+    apply_diff(data.setdefault('sessions_by_date', {}), upserts, removals)
+    categories = data.setdefault('categories', {})
+    for name, colour in colours.items():
+        if colour is None:
+            categories.pop(name, None)
+        else:
+            categories[name] = colour
+
 class PomodoroTimer:
-    def __init__(self, master):
+    def __init__(self, master, scheduler=None, clock=SYSTEM_CLOCK, live_path=LIVE_PATH,
+                 notifier=None):
         self.master = master
         self.master.title('Pomodoro Timer')
-        self.model = TimerModel()
+        # anything with Tk's after/after_cancel; soak runs pass a virtual one
+        self.scheduler = scheduler or master
+        self._tick_job = None
+        # widget values last drawn, so unchanged ones are not touched again
+        self._drawn = {}
+        self._visible = True
+        # the month is taken from the clock so virtual runs stay in theirs
+        self._month = f'{datetime.fromtimestamp(clock.time()):%Y-%m}'
+        self.model = TimerModel(clock=clock, events=open_events(self._month))
         self.active_name = 'Session'
+        # no sound sink without simpleaudio; ring Tk's bell instead, unless
+        # the caller brought its own dispatcher
+        self._bell = notifier is None and not sound_available()
+        if notifier is None:
+            notifier = default_dispatcher(os.environ.get('POMOPAD_WEBHOOK'))
+        self.notifier = notifier
+        self.history = UndoStack()
+        # this month from memory, older months and rollups from disk
+        self.query = QueryEngine(HistorySource(lambda: self.sessions_by_date, clock=clock))
+        try:
+            self.live = LiveStateWriter(live_path)
+        except OSError:
+            self.live = None
+        self.model.listeners.append(lambda event: self._publish_live())
 
         self.style = ttk.Style()
         self.style.configure('Work.Horizontal.TProgressbar', background='red')
@@ -139,8 +195,11 @@ class PomodoroTimer:
         self.progress.pack(fill='x', padx=10)
 
         # todo list
-        self.tasks = []
+        self.task_store = TaskStore(clock=clock)
+        # listbox row -> task id, kept in step with the store's order index
+        self.task_rows = []
         self.active_task = None
+        self._log_mark = 0
         self.new_task_var = tk.StringVar()
         task_entry = ttk.Entry(self.timer_frame, textvariable=self.new_task_var)
         task_entry.pack(fill='x', padx=5, pady=2)
@@ -150,6 +209,8 @@ class PomodoroTimer:
         self.task_listbox.pack(fill='both', expand=True, padx=5)
         self.task_listbox.bind('<Double-1>', self.edit_task)
         self.task_listbox.bind('<Button-1>', self._task_click)
+        ttk.Button(self.timer_frame, text='Archive done', command=self.archive_done_tasks).pack(
+            anchor='e', padx=5)
 
         button_frame = ttk.Frame(self.timer_frame)
         button_frame.pack(pady=10)
@@ -205,12 +266,30 @@ class PomodoroTimer:
         self.analytics_ctx = analytics_setup(self.analytics_frame)
         self.analytics_ctx["period_var"].trace_add("write", lambda *a: self.refresh_analytics())
 
+        # file I/O runs on the storage thread; merges it finds come back
+        # through this queue and are applied by _check_external
+        self.storage = StorageThread(clock=clock)
+        self._incoming = queue.SimpleQueue()
+        self.storage.service.listeners.append(lambda *diff: self._incoming.put(diff))
+        # a pending reload, whose month-file tasks are folded into the task store
+        self._reload = None
         self.load_data()
+        compact_history()
+        self.watcher = FileWatcher(current_file(self._month))
+        # the service marks its own writes seen once they are on disk
+        self.storage.service.watchers.append(self.watcher)
+        self._external_job = self.scheduler.after(2000, self._check_external)
         self.master.protocol('WM_DELETE_WINDOW', self.on_close)
 
+        for sequence in ('<Map>', '<Unmap>', '<Visibility>'):
+            master.bind(sequence, self._on_visibility, add='+')
+
         master.bind('<space>', self.toggle)
 
         master.bind('r', lambda e: self.reset())
+        master.bind('<Control-z>', self.undo)
+        master.bind('<Control-y>', self.redo)
+        master.bind('<Control-Z>', self.redo)
 
         self._update_display()
         self.refresh_analytics()
@@ -243,17 +322,11 @@ class PomodoroTimer:
         self.sessions_pane.categories = self.categories
         self.sessions_pane.update_list()
 
-    def aggregate(self, start_date, end_date):
-        total = {}
-        for date, sess in self.sessions_by_date.items():
-            if start_date <= date <= end_date:
-                for s in sess.values():
-                    cat = s.get('category') or 'Uncategorised'
-                    total[cat] = total.get(cat, 0) + s.get('elapsed', 0)
-        return total
+    def _today(self):
+        return datetime.fromtimestamp(self.model.clock.time()).date()
 
     def compute_streak(self):
-        today = datetime.now().date()
+        today = self._today()
         streak = 0
         d = today
         while True:
@@ -266,10 +339,11 @@ class PomodoroTimer:
         return streak
 
     def refresh_analytics(self):
-        analytics_refresh(self.analytics_ctx, self.sessions_by_date)
+        analytics_refresh(self.analytics_ctx, self.query, self.categories, self._today())
 
     def show_stats(self):
-        show_stats(self.master, self.sessions_by_date, self.categories)
+        today = self.sessions_by_date.get(self._today().isoformat(), {})
+        show_stats(self.master, today, self.categories)
 
     def apply_theme(self, *_):
         if self.theme_var.get():
@@ -285,46 +359,97 @@ class PomodoroTimer:
         m, s = divmod(seconds, 60)
         return f"{m:02d}:{s:02d}"
 
+    def _draw(self, key, value, apply):
+        if self._drawn.get(key) != value:
+            self._drawn[key] = value
+            apply(value)
+
     def _update_display(self):
-        self.label.config(text=self._format_time(self.model.state.remaining))
-        if self.model.state.mode == 'break':
-            self.progress.configure(
-                style='Break.Horizontal.TProgressbar',
-                maximum=BREAK_DURATION if self.model.pomo_count % 4 else LONG_BREAK_DURATION,
-            )
+        self._publish_live()
+        if not self._visible:
+            return
+        state = self.model.state
+        remaining = self._format_time(state.remaining)
+        self._draw('label', remaining, lambda text: self.label.config(text=text))
+        if state.mode == 'break':
+            look = ('Break.Horizontal.TProgressbar',
+                    BREAK_DURATION if self.model.pomo_count % 4 else LONG_BREAK_DURATION)
         else:
-            self.progress.configure(style='Work.Horizontal.TProgressbar', maximum=WORK_DURATION)
-        self.progress['value'] = (self.progress['maximum'] - self.model.state.remaining)
+            look = ('Work.Horizontal.TProgressbar', WORK_DURATION)
+        # restyling the bar is the expensive part and only needed on a mode flip
+        self._draw('look', look, lambda v: self.progress.configure(style=v[0], maximum=v[1]))
+        self._draw('progress', look[1] - state.remaining,
+                   lambda value: self.progress.configure(value=value))
         text = (
-            f"{self.active_name} \u2794 \u23F1 {self._format_time(self.model.state.remaining)} left "
+            f"{self.active_name} \u2794 \u23F1 {remaining} left "
             f"\u2022 \U0001F345 {self.model.pomo_count} \u2022 \U0001F525 {self.streak}"
         )
-        self.status_var.set(text)
+        self._draw('status', text, self.status_var.set)
+
+    def _on_visibility(self, event):
+        if event.widget is not self.master:
+            return
+        if event.type == tk.EventType.Unmap:
+            visible = False
+        elif event.type == tk.EventType.Visibility:
+            visible = event.state != 'VisibilityFullyObscured'
+        else:
+            visible = True
+        if visible == self._visible:
+            return
+        self._visible = visible
+        if visible:
+            self._drawn.clear()
+            if self._external_job is None:
+                self._check_external()
+        if self.model.state.running:
+            # catch up and reschedule at the rate that fits the new state
+            self._cancel_tick()
+            self._tick()
+        elif visible:
+            self._update_display()
+
+    def _publish_live(self):
+        if self.live is not None:
+            self.live.publish_model(self.model, self.streak, self.active_name)
 
     def _tick(self):
-        event = self.model.tick()
-        if event:
+        self._tick_job = None
+        for event in self.model.catch_up():
             self._alert(event)
         if self.model.state.running:
             self._update_display()
-            self.master.after(1000, self._tick)
+            # a hidden window only wakes up when the phase ends
+            delay = self.model.next_wakeup(transitions_only=not self._visible)
+            self._tick_job = self.scheduler.after(math.ceil(delay * 1000), self._tick)
+
+    def _cancel_tick(self):
+        # a stop/start within one second must not leave two tick chains
+        if self._tick_job is not None:
+            self.scheduler.after_cancel(self._tick_job)
+            self._tick_job = None
 
     def start(self):
         if not self.model.state.running:
             sel = self.task_listbox.curselection()
             if sel:
-                self.active_task = self.tasks[sel[0]]
-                self.active_name = self.active_task.get('name')
+                self.active_task = self.task_rows[sel[0]]
+                self.active_name = self.task_store.get(self.active_task)['name']
             else:
                 self.active_task = None
                 self.active_name = self.quick_name_var.get()
+            self._log_mark = len(self.model.events)
+            self._cancel_tick()
             self.model.start()
             self._update_display()
             self._tick()
 
     def stop(self):
         if self.model.state.running:
+            for event in self.model.catch_up():
+                self._alert(event)
             self.model.stop()
+            self._cancel_tick()
             if self.active_task:
                 self.auto_save_task_session()
             self.active_task = None
@@ -336,36 +461,48 @@ class PomodoroTimer:
             self.start()
 
     def _alert(self, event):
-        # play sound
-        try:
-            if sys.platform == 'win32':
-                import winsound
-                winsound.MessageBeep()
-            else:
-                import simpleaudio as sa
-                import math
-                import struct
-                freq = 880
-                fs = 44100
-                dur = 0.2
-                samples = [math.sin(2 * math.pi * freq * t / fs) for t in range(int(fs*dur))]
-                audio = b''.join(struct.pack('<h', int(s*32767*0.3)) for s in samples)
-                sa.play_buffer(audio, 1, 2, fs)
-        except Exception:
-            try:
-                self.master.bell()
-            except Exception:
-                pass
+        # sound, desktop and webhook notifications run off the UI thread
+        if event == 'work_complete':
+            self.notifier.notify(event, 'Work complete', f'{self.active_name}: time for a break')
+        else:
+            self.notifier.notify(event, 'Break over', 'Back to work')
+        if self._bell:
+            self.master.bell()
 
         # flash background
         self.master.config(bg='yellow')
         self.master.after(1000, lambda: self.master.config(bg=self.default_bg))
 
         if event == 'work_complete':
-            if messagebox.askyesno('Work complete', 'Save this session?'):
-                self.quick_save_session()
+            # the prompt stays until answered, so it saves the session as it
+            # was when it finished, not whatever phase runs by then
+            elapsed, ts = self._elapsed(), self.model.start_timestamp
+            self._toast('Work complete', 'Save this session?',
+                        lambda: self.quick_save_session(elapsed=elapsed, ts=ts))
+
+    def _toast(self, title, message, action=None, timeout=None):
+        """Show a small non-modal popup.
+
+        It closes itself after ``timeout`` ms if one is given, otherwise it
+        stays until the user clicks one of its buttons.
+        """
+        toast = tk.Toplevel(self.master)
+        toast.title(title)
+        toast.transient(self.master)
+        ttk.Label(toast, text=message).pack(padx=10, pady=5)
+        buttons = ttk.Frame(toast)
+        buttons.pack(pady=5)
+        if action:
+            def run():
+                toast.destroy()
+                action()
+            ttk.Button(buttons, text='Save', command=run).pack(side='left', padx=2)
+        ttk.Button(buttons, text='Dismiss', command=toast.destroy).pack(side='left', padx=2)
+        if timeout is not None:
+            self.scheduler.after(timeout, lambda: toast.winfo_exists() and toast.destroy())
 
     def reset(self, event=None):
+        self._cancel_tick()
         self.model.reset()
         self._update_display()
 
@@ -375,17 +512,34 @@ class PomodoroTimer:
     def auto_save_task_session(self):
         if not self.active_task:
             return
-        elapsed = self._elapsed()
-        name = self.active_task.get('name')
-        ts = self.model.start_timestamp
-        date_key = datetime.fromtimestamp(ts).date().isoformat() if ts else datetime.now().date().isoformat()
-        entry = {
-            'elapsed': elapsed,
-            'timestamp': ts,
-            'notes': self.active_task.get('note', ''),
-            'color': self._task_color(name),
-        }
-        self.sessions_by_date.setdefault(date_key, {})[name] = entry
+        task = self.task_store.get(self.active_task)
+        name = task['name']
+        intervals = self.model.events.intervals('work', self._log_mark)
+        elapsed = int(round(sum(end - begin for begin, end in intervals)))
+        pomodoros = sum(1 for ev in self.model.events.events(self._log_mark)
+                        if ev.kind == PHASE and ev.mode == 'break')
+        self.task_store.record_focus(self.active_task, elapsed, pomodoros)
+        ts = intervals[0][0] if intervals else self.model.start_timestamp
+        date_key = datetime.fromtimestamp(ts).date().isoformat() if ts else self._today().isoformat()
+        day = self.sessions_by_date.setdefault(date_key, {})
+        previous = day.get(name)
+        if previous:
+            # same task again today: extend the record instead of replacing
+            # it, keeping its category, edited notes and sync id
+            entry = dict(previous)
+            entry['elapsed'] = previous.get('elapsed', 0) + elapsed
+            entry['intervals'] = previous.get('intervals', []) + [list(i) for i in intervals]
+            entry['timestamp'] = previous.get('timestamp') or ts
+        else:
+            entry = {
+                'elapsed': elapsed,
+                'timestamp': ts,
+                'category': '',
+                'notes': task.get('note', ''),
+                'intervals': [list(i) for i in intervals],
+            }
+        entry['color'] = self._task_color(name)
+        day[name] = entry
         self.flat_sessions[name] = (date_key, entry)
         self.active_name = name
         self.refresh_sessions()
@@ -418,7 +572,7 @@ class PomodoroTimer:
         date_key = (
             datetime.fromtimestamp(ts).date().isoformat()
             if ts
-            else datetime.now().date().isoformat()
+            else self._today().isoformat()
         )
         self.sessions_by_date.setdefault(date_key, {})[name] = {
             "elapsed": elapsed,
@@ -434,12 +588,12 @@ class PomodoroTimer:
         self.refresh_analytics()
         self._update_display()
 
-    def quick_save_session(self, event=None):
+    def quick_save_session(self, event=None, elapsed=None, ts=None):
         """Save current session using the text entry without showing a dialog."""
-        elapsed = self._elapsed()
+        if elapsed is None:
+            elapsed, ts = self._elapsed(), self.model.start_timestamp
         name = self.quick_name_var.get() or f"Session {len(self.flat_sessions)+1}"
-        ts = self.model.start_timestamp
-        date_key = datetime.fromtimestamp(ts).date().isoformat() if ts else datetime.now().date().isoformat()
+        date_key = datetime.fromtimestamp(ts).date().isoformat() if ts else self._today().isoformat()
         self.sessions_by_date.setdefault(date_key, {})[name] = {
             'elapsed': elapsed,
             'timestamp': ts,
@@ -455,43 +609,74 @@ class PomodoroTimer:
         self._update_display()
 
     # ----- task management -----
+    def _task_text(self, task):
+        prefix = '☑' if task['done'] else '☐'
+        return f"{prefix} {task['name']}"
+
     def refresh_task_list(self):
+        """Rebuild the whole list, after loading or other instances' edits."""
+        self.task_rows = self.task_store.visible()
         self.task_listbox.delete(0, tk.END)
-        for t in self.tasks:
-            prefix = '☑' if t.get('done') else '☐'
-            self.task_listbox.insert(tk.END, f"{prefix} {t.get('name')}")
+        if self.task_rows:
+            self.task_listbox.insert(tk.END, *(self._task_text(self.task_store.get(t))
+                                               for t in self.task_rows))
+
+    def _redraw_task(self, tid):
+        """Redraw the single row showing ``tid``."""
+        if self.task_store.changed_elsewhere():
+            # our edit replayed other instances' ops first; rows moved
+            self.refresh_task_list()
+            return
+        row = self.task_store.position(tid)
+        selected = self.task_listbox.selection_includes(row)
+        self.task_listbox.delete(row)
+        self.task_listbox.insert(row, self._task_text(self.task_store.get(tid)))
+        if selected:
+            self.task_listbox.selection_set(row)
 
     def add_task(self, event=None):
         name = self.new_task_var.get().strip()
         if not name:
             return
-        self.tasks.append({'name': name, 'note': '', 'done': False})
+        tid = self.task_store.add(name)
         self.new_task_var.set('')
-        self.refresh_task_list()
-        self.save_data()
+        if self.task_store.changed_elsewhere():
+            self.refresh_task_list()
+            return
+        # new tasks always sort last
+        self.task_rows.append(tid)
+        self.task_listbox.insert(tk.END, self._task_text(self.task_store.get(tid)))
 
     def _task_click(self, event):
         index = self.task_listbox.nearest(event.y)
-        if event.x < 20 and 0 <= index < len(self.tasks):
-            self.tasks[index]['done'] = not self.tasks[index].get('done')
-            self.refresh_task_list()
-            self.task_listbox.selection_set(index)
-            self.save_data()
+        if event.x < 20 and 0 <= index < len(self.task_rows):
+            tid = self.task_rows[index]
+            self.task_store.toggle(tid)
+            self._redraw_task(tid)
+            self.task_listbox.selection_set(self.task_store.position(tid))
 
     def edit_task(self, event=None):
         sel = self.task_listbox.curselection()
         if not sel:
             return
-        idx = sel[0]
-        task = self.tasks[idx]
-        dialog = TaskDialog(self.master, task)
+        tid = self.task_rows[sel[0]]
+        dialog = TaskDialog(self.master, self.task_store.get(tid))
         dialog.wait_window()
         if not dialog.result:
             return
-        self.tasks[idx] = dialog.result
-        self.refresh_task_list()
-        self.save_data()
-
+        self.task_store.edit(tid, **dialog.result)
+        self._redraw_task(tid)
+
+    def archive_done_tasks(self):
+        """Move finished tasks off the list; they stay in the store."""
+        # delete bottom-up so earlier row numbers stay valid
+        for tid in reversed(self.task_store.done()):
+            row = self.task_store.position(tid)
+            self.task_listbox.delete(row)
+            del self.task_rows[row]
+        self.task_store.archive_done()
+        if self.task_store.changed_elsewhere():
+            self.refresh_task_list()
 
     def rename_session(self):
         sel = self.sessions_pane.listbox.curselection()
@@ -502,7 +687,13 @@ class PomodoroTimer:
         if new_name:
             date_key, data = self.flat_sessions.pop(current)
             self.sessions_by_date[date_key].pop(current)
+            replaced = self.sessions_by_date[date_key].get(new_name)
             self.sessions_by_date[date_key][new_name] = data
+            self.history.record(
+                Change('rename session')
+                .session(date_key, current, data, None)
+                .session(date_key, new_name, replaced, data)
+            )
             self.flat_sessions[new_name] = (date_key, data)
             self.sessions_pane.listbox.delete(sel)
             self.sessions_pane.listbox.insert(sel, new_name)
@@ -518,8 +709,9 @@ class PomodoroTimer:
             return
         name = self.sessions_pane.listbox.get(sel)
         self.sessions_pane.listbox.delete(sel)
-        date_key, _ = self.flat_sessions.pop(name)
+        date_key, data = self.flat_sessions.pop(name)
         self.sessions_by_date.get(date_key, {}).pop(name, None)
+        self.history.record(Change('delete session').session(date_key, name, data, None))
         self.refresh_sessions()
         self.save_data()
         self.streak = self.compute_streak()
@@ -528,6 +720,49 @@ class PomodoroTimer:
         self.streak = self.compute_streak()
         self.refresh_analytics()
 
+    def undo(self, event=None):
+        self._apply_history(self.history.undo)
+
+    def redo(self, event=None):
+        self._apply_history(self.history.redo)
+
+    def _apply_history(self, step):
+        change, touched = step(self.sessions_by_date, self.categories)
+        if change is None:
+            return
+        upserts, removals = {}, []
+        for date_key, name in touched:
+            entry = self.sessions_by_date.get(date_key, {}).get(name)
+            if entry is None:
+                if self.flat_sessions.get(name, (None,))[0] == date_key:
+                    self.flat_sessions.pop(name)
+                removals.append((date_key, name))
+            else:
+                self.flat_sessions[name] = (date_key, entry)
+                upserts.setdefault(date_key, {})[name] = entry
+        colours = {name: self.categories.get(name) for name, _, _ in change.categories}
+        # only the records and categories the step touched go to the
+        # service, instead of a snapshot of the whole month
+        self.query.invalidate()
+        upserts = snapshot(upserts)
+        self.storage.submit(self.storage.service.mutate(
+            lambda data: _apply_delta(data, upserts, removals, colours)))
+        self._advance_sent(upserts, removals)
+        if colours:
+            self._sent = dict(self._sent, categories=dict(self.categories))
+        selected = self.sessions_pane.filter_var.get()
+        if colours:
+            self.update_filter_options()
+        if self.sessions_pane.filter_var.get() == selected:
+            self.sessions_pane.update_rows(upserts, removals)
+        else:
+            self.refresh_sessions()
+        self.streak = self.compute_streak()
+        start = analytics_window(self.analytics_ctx, self._today())[0].isoformat()
+        if colours or any(date_key >= start for date_key, _ in touched):
+            self.refresh_analytics()
+        self._update_display()
+
     def view_session(self, event=None):
         sel = self.sessions_pane.listbox.curselection()
         if not sel:
@@ -562,11 +797,12 @@ class PomodoroTimer:
         ttk.Button(dialog, text='Close', command=dialog.destroy).pack(pady=5)
 
     def load_data(self):
-        data = load_sessions()
+        data = snapshot(self.storage.call(self.storage.service.load))
         self.sessions_by_date = data.get('sessions_by_date', {})
         self.categories = data.get('categories', {})
-        self.tasks = data.get('tasks', [])
-        self.theme_var.set(bool(data.get('theme', self.theme_var.get())))
+        self.task_store.close()
+        self.task_store = open_tasks(data.get('tasks', []), self.model.clock)
+        self.theme_var.set(data['theme'])
         self.apply_theme()
         self.flat_sessions = {
             name: (date, sess[name])
@@ -578,18 +814,92 @@ class PomodoroTimer:
         self.refresh_task_list()
         if self.sessions_by_date:
             pass
+        # the last state sent to the storage service, see save_data
+        self._sent = snapshot(self._state())
 
-    def save_data(self):
-        data = {
+    def _state(self):
+        # only the keys this window edits; others (e.g. the sync metadata)
+        # are left to the storage service's copy
+        return {
             'sessions_by_date': self.sessions_by_date,
             'categories': self.categories,
-            'tasks': self.tasks,
+            'tasks': self.task_store.tasks(),
             'theme': self.theme_var.get(),
         }
-        save_sessions(data)
+
+    def save_data(self):
+        self.query.invalidate()
+        # only the edits since the last save are merged into the service's
+        # copy, so records it picked up from other instances survive
+        ours = snapshot(self._state())
+        self.storage.submit(self.storage.service.update(self._sent, ours))
+        self._sent = ours
+
+    def _advance_sent(self, upserts, removals):
+        # the service may still hold the old base, so only the touched days
+        # are copied
+        sent = dict(self._sent['sessions_by_date'])
+        for date_key in {d for d, _ in removals} | set(upserts):
+            if date_key in sent:
+                sent[date_key] = dict(sent[date_key])
+        apply_diff(sent, snapshot(upserts), removals)
+        self._sent = dict(self._sent, sessions_by_date=sent)
+
+    def _merge_external(self, upserts, removals, categories):
+        if not upserts and not removals and categories == self.categories:
+            return
+        apply_diff(self.sessions_by_date, upserts, removals)
+        self.query.invalidate()
+        for date_key, name in removals:
+            self.flat_sessions.pop(name, None)
+        for date_key, sessions in upserts.items():
+            for name in sessions:
+                self.flat_sessions[name] = (date_key, self.sessions_by_date[date_key][name])
+        # keep our base in step so the merged records are not later sent
+        # back as edits of our own
+        self._advance_sent(upserts, removals)
+        selected = self.sessions_pane.filter_var.get()
+        if categories != self.categories:
+            self.categories.clear()
+            self.categories.update(categories)
+            self._sent = dict(self._sent, categories=dict(categories))
+            self.update_filter_options()
+        if self.sessions_pane.filter_var.get() == selected:
+            self.sessions_pane.update_rows(upserts, removals)
+        else:
+            self.refresh_sessions()
+        self.streak = self.compute_streak()
+        self.refresh_analytics()
+        self._update_display()
+
+    def _check_external(self):
+        self._external_job = None
+        if self.watcher.changed():
+            self._reload = self.storage.submit(self.storage.service.reload())
+        while not self._incoming.empty():
+            self._merge_external(*self._incoming.get())
+        # tasks come from other instances' journal lines and, through sync,
+        # from the month file
+        tasks_changed = self.task_store.refresh()
+        if self._reload is not None and self._reload.done():
+            reload, self._reload = self._reload, None
+            if reload.exception() is None and self.task_store.fold(reload.result().get('tasks', [])):
+                tasks_changed = True
+        if tasks_changed:
+            self.refresh_task_list()
+        # while hidden, edits from other instances wait until the window is shown
+        if self._visible:
+            self._external_job = self.scheduler.after(2000, self._check_external)
 
     def on_close(self):
         self.save_data()
+        self.storage.close()
+        self.watcher.close()
+        self.task_store.close()
+        self.model.events.close()
+        self.notifier.close()
+        if self.live is not None:
+            self.live.close()
         self.master.destroy()
 
     def dock_bottom(self):
@@ -634,6 +944,7 @@ class PomodoroTimer:
             if new_cat and new_cat not in self.categories:
                 color = colorchooser.askcolor()[1] or '#ffffff'
                 self.categories[new_cat] = color
+                self.history.record(Change('add category').category(new_cat, None, color))
                 refresh_list()
                 self.save_data()
                 self.update_filter_options()
@@ -645,12 +956,21 @@ class PomodoroTimer:
             old_name = listbox.get(sel)
             new_name = simpledialog.askstring('Rename Category', 'New name:', initialvalue=old_name, parent=dialog)
             if new_name and new_name not in self.categories:
-                self.categories[new_name] = self.categories.pop(old_name)
+                color = self.categories.pop(old_name)
+                self.categories[new_name] = color
                 # update sessions with old category name
+                keys = []
                 for date, sess in self.sessions_by_date.items():
-                    for s in sess.values():
+                    for sname, s in sess.items():
                         if s.get('category') == old_name:
                             s['category'] = new_name
+                            keys.append((date, sname))
+                self.history.record(
+                    Change('rename category')
+                    .category(old_name, color, None)
+                    .category(new_name, None, color)
+                    .field('category', old_name, new_name, keys)
+                )
                 refresh_list()
                 self.save_data()
                 self.update_filter_options()
@@ -661,12 +981,19 @@ class PomodoroTimer:
                 return
             name = listbox.get(sel)
             if messagebox.askyesno('Delete Category', f'Delete category "{name}"?', parent=dialog):
-                self.categories.pop(name, None)
+                color = self.categories.pop(name, None)
                 # remove category from sessions
+                keys = []
                 for date, sess in self.sessions_by_date.items():
-                    for s in sess.values():
+                    for sname, s in sess.items():
                         if s.get('category') == name:
                             s['category'] = ''
+                            keys.append((date, sname))
+                self.history.record(
+                    Change('delete category')
+                    .category(name, color, None)
+                    .field('category', name, '', keys)
+                )
                 refresh_list()
                 self.save_data()
                 self.update_filter_options()
@@ -678,6 +1005,7 @@ class PomodoroTimer:
             name = listbox.get(sel)
             color = colorchooser.askcolor(color=self.categories.get(name, '#ffffff'))[1]
             if color:
+                self.history.record(Change('change colour').category(name, self.categories.get(name), color))
                 self.categories[name] = color
                 self.save_data()
 
@@ -1,17 +1,37 @@
+from datetime import datetime
+import os
 from pathlib import Path
 import webview
+from coordination import FileWatcher
+from live_state import LiveStateWriter
+from notifications import default_dispatcher
+from query import Query
+from storage import current_file, open_events
+from storage_service import StorageThread
 from timer_model import TimerModel
 
 
 class API:
     def __init__(self):
-        self.model = TimerModel()
+        self.model = TimerModel(events=open_events())
+        # pywebview calls these methods on its bridge thread; disk access
+        # happens on the storage thread instead
+        self._storage = StorageThread()
+        self._watcher = FileWatcher(current_file())
+        self._storage.service.watchers.append(self._watcher)
+        self._notifier = default_dispatcher(os.environ.get('POMOPAD_WEBHOOK'))
+        try:
+            self._live = LiveStateWriter()
+            self.model.listeners.append(lambda event: self._live.publish_model(self.model))
+        except OSError:
+            self._live = None
 
     def start(self):
         self.model.start()
         return True
 
     def stop(self):
+        self.tick()
         self.model.stop()
         return True
 
@@ -19,13 +39,52 @@ class API:
         self.model.reset()
         return True
 
+    def save_session(self, name='Session', category='', notes=''):
+        """Record the current phase's focused time; the write is batched."""
+        ts = self.model.start_timestamp or self.model.clock.time()
+        date_key = datetime.fromtimestamp(ts).date().isoformat()
+        entry = {'elapsed': self.model.elapsed(), 'timestamp': ts,
+                 'category': category, 'notes': notes}
+
+        def add(data):
+            data['sessions_by_date'].setdefault(date_key, {})[name] = entry
+
+        self._storage.submit(self._storage.service.mutate(add))
+        return True
+
+    def sessions(self, date_key=None):
+        """Sessions recorded on ``date_key`` (default today), from the service's cache."""
+        date_key = date_key or datetime.now().date().isoformat()
+        return self._storage.call(self._storage.service.day, date_key)
+
+    def query(self, params=None):
+        """Run an analytics query, e.g. ``{'start': '2024-05-01', 'group_by': 'day'}``."""
+        if self._watcher.changed():
+            self._storage.call(self._storage.service.reload)
+        try:
+            result = self._storage.call(self._storage.service.query, Query(**(params or {})))
+        except (TypeError, ValueError) as exc:
+            return {'error': str(exc)}
+        if isinstance(result, dict):
+            result = {str(k): v for k, v in result.items()}
+        return {'result': result}
+
     def tick(self):
-        event = self.model.tick()
+        """Bring the timer up to date; the page may call this at any interval."""
+        events = self.model.catch_up()
+        for event in events:
+            if event == 'work_complete':
+                self._notifier.notify(event, 'Work complete', 'Time for a break')
+            else:
+                self._notifier.notify(event, 'Break over', 'Back to work')
         return {
             'remaining': self.model.state.remaining,
             'mode': self.model.state.mode,
             'running': self.model.state.running,
-            'event': event,
+            'event': events[-1] if events else None,
+            # seconds until the next tick, and until the phase ends
+            'next': self.model.next_wakeup(),
+            'transition': self.model.next_wakeup(transitions_only=True),
         }
 
 
@@ -34,6 +93,8 @@ def main():
     html = (Path(__file__).parent / 'web' / 'index.html').read_text()
     window = webview.create_window('Pomodoro', html=html, js_api=api)
     webview.start()
+    api._storage.close()
+    api.model.events.close()
 
 
 if __name__ == '__main__':
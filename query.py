@@ -0,0 +1,212 @@
+"""Small query engine for ad-hoc session analytics.
+
+A :class:`Query` describes filters, a grouping and an aggregate::
+
+    Query(start='2024-05-01', end='2024-05-07', category='Work', group_by='day')
+
+:class:`QueryEngine` runs it against a source. The date range is pushed
+down to the source, which only reads the days (and, for storage, the
+month files) inside it. Cheap predicates run before substring matches.
+Results are cached per query until the engine is invalidated.
+"""
+from dataclasses import dataclass
+from datetime import date, datetime
+
+from clock import SYSTEM_CLOCK
+from storage import history_start, load_range, month_range
+
+GROUPS = (None, 'day', 'week', 'month', 'category', 'hour', 'name')
+MEASURES = ('sum', 'count', 'avg')
+
+
+@dataclass(frozen=True)
+class Query:
+    start: str = None
+    end: str = None
+    category: str = None
+    task: str = None
+    name: str = None
+    notes: str = None
+    group_by: str = None
+    measure: str = 'sum'
+
+    def __post_init__(self):
+        if self.group_by not in GROUPS:
+            raise ValueError(f'cannot group by {self.group_by!r}')
+        if self.measure not in MEASURES:
+            raise ValueError(f'unknown measure {self.measure!r}')
+
+    @property
+    def needs_records(self):
+        """True if the query looks inside individual sessions.
+
+        Rollups of compacted months only know day and category totals, so
+        such queries decompress those months' archives instead.
+        """
+        return bool(self.task or self.name or self.notes or self.group_by in ('hour', 'name'))
+
+
+class MemorySource:
+    """Sessions already in memory, e.g. ``PomodoroTimer.sessions_by_date``."""
+
+    def __init__(self, sessions_by_date):
+        self._sessions = sessions_by_date
+
+    def days(self, start, end, records=False):
+        sessions = self._sessions() if callable(self._sessions) else self._sessions
+        for day, records in sessions.items():
+            if (start is None or day >= start) and (end is None or day <= end):
+                yield day, records
+
+    def months(self, start, end):
+        return None
+
+
+class StorageSource:
+    """Sessions on disk; only month files overlapping the range are read."""
+
+    def __init__(self, data_dir=None, clock=SYSTEM_CLOCK):
+        self.data_dir = data_dir
+        self.clock = clock
+
+    def today(self):
+        return date.fromtimestamp(self.clock.time())
+
+    def days(self, start, end, records=False):
+        """Yield ``(day, sessions)``; ``records`` drills into archived months."""
+        start = start or history_start(self.data_dir)
+        end = end or self.today().isoformat()
+        if start is None:
+            return iter(())
+        return iter(load_range(start, end, data_dir=self.data_dir, records=records).items())
+
+    def months(self, start, end):
+        start = start or history_start(self.data_dir)
+        if start is None:
+            return []
+        return list(month_range(start, end or self.today().isoformat()))
+
+
+class HistorySource:
+    """The loaded month from memory, every other month from disk.
+
+    For a front end that holds this month's ``sessions_by_date``, so
+    views spanning a month boundary need not read it back.
+    """
+
+    def __init__(self, sessions_by_date, data_dir=None, clock=SYSTEM_CLOCK):
+        self._memory = MemorySource(sessions_by_date)
+        self._storage = StorageSource(data_dir, clock)
+
+    def days(self, start, end, records=False):
+        today = self._storage.today()
+        month = f'{today:%Y-%m}'
+        start = start or history_start(self._storage.data_dir)
+        end = end or today.isoformat()
+        if start is not None and start[:7] < month:
+            yield from load_range(start, end, exclude=month, data_dir=self._storage.data_dir,
+                                  records=records).items()
+        yield from self._memory.days(start, end)
+
+    def months(self, start, end):
+        return self._storage.months(start, end)
+
+
+def _week(day, entry):
+    y, w, _ = date.fromisoformat(day).isocalendar()
+    return f'{y}-W{w:02d}'
+
+
+def _hour(day, entry):
+    ts = entry.get('timestamp')
+    return datetime.fromtimestamp(ts).hour if ts else None
+
+
+_KEYS = {
+    None: lambda day, name, entry: None,
+    'day': lambda day, name, entry: day,
+    'week': lambda day, name, entry: _week(day, entry),
+    'month': lambda day, name, entry: day[:7],
+    'category': lambda day, name, entry: entry.get('category') or 'Uncategorised',
+    'hour': lambda day, name, entry: _hour(day, entry),
+    'name': lambda day, name, entry: name,
+}
+
+
+def _predicates(query):
+    preds = []
+    # exact matches first, substring scans last
+    if query.category is not None:
+        wanted = '' if query.category == 'Uncategorised' else query.category
+        preds.append(lambda name, entry: (entry.get('category') or '') == wanted)
+    if query.task is not None:
+        preds.append(lambda name, entry: name == query.task)
+    if query.needs_records:
+        preds.append(lambda name, entry: not entry.get('rollup'))
+    if query.name:
+        needle = query.name.lower()
+        preds.append(lambda name, entry: needle in name.lower())
+    if query.notes:
+        needle = query.notes.lower()
+        preds.append(lambda name, entry: needle in (entry.get('notes') or '').lower())
+    return preds
+
+
+def execute(query, source):
+    """Run ``query`` against ``source`` without caching."""
+    preds = _predicates(query)
+    key = _KEYS[query.group_by]
+    totals = {}
+    counts = {}
+    # record-level queries decompress archived months instead of using rollups
+    for day, records in source.days(query.start, query.end, query.needs_records):
+        for name, entry in records.items():
+            if all(p(name, entry) for p in preds):
+                group = key(day, name, entry)
+                totals[group] = totals.get(group, 0) + entry.get('elapsed', 0)
+                counts[group] = counts.get(group, 0) + entry.get('count', 1)
+    if query.measure == 'sum':
+        result = totals
+    elif query.measure == 'count':
+        result = counts
+    else:
+        result = {g: totals[g] / counts[g] for g in totals if counts[g]}
+    if query.group_by is None:
+        return result.get(None, 0)
+    return result
+
+
+class QueryEngine:
+    """Runs queries against one source and caches the results."""
+
+    def __init__(self, source, max_entries=128):
+        self.source = source
+        self.max_entries = max_entries
+        self._cache = {}
+
+    def run(self, query=None, **filters):
+        query = query or Query(**filters)
+        if query in self._cache:
+            # move to the end so the least recently used entry goes first
+            result = self._cache.pop(query)
+        else:
+            result = execute(query, self.source)
+        self._cache[query] = result
+        while len(self._cache) > self.max_entries:
+            del self._cache[next(iter(self._cache))]
+        return result
+
+    def explain(self, query):
+        """Describe how ``query`` would be executed."""
+        months = self.source.months(query.start, query.end)
+        return {
+            'months': months,
+            'date_range': (query.start, query.end),
+            'filters': [f for f in ('category', 'task', 'name', 'notes') if getattr(query, f)],
+            'group_by': query.group_by,
+            'measure': query.measure,
+            'cached': query in self._cache,
+        }
+
+    def invalidate(self):
+        self._cache.clear()
@@ -0,0 +1,123 @@
+"""Headless weekly focus reports for many users.
+
+``python reports.py OUT_DIR HOME_OR_POMOPAD_DIR...`` writes, for every
+user, ``OUT_DIR/<user>/summary.json`` and ``OUT_DIR/<user>/week.png``.
+Users are processed in a process pool and results are reported as each
+one finishes. Charts use matplotlib's Agg backend and never touch Tk.
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, timedelta
+
+from query import MemorySource, Query, StorageSource, execute
+
+
+def _data_dir(path):
+    nested = os.path.join(path, '.pomopad')
+    return nested if os.path.isdir(nested) else path
+
+
+def _user_name(path):
+    path = os.path.abspath(path)
+    if os.path.basename(path) == '.pomopad':
+        path = os.path.dirname(path)
+    return os.path.basename(path)
+
+
+def summarise(data_dir, week_end):
+    """Aggregate one user's week ending on ``week_end`` (a date)."""
+    start = (week_end - timedelta(days=6)).isoformat()
+    end = week_end.isoformat()
+    source = StorageSource(data_dir)
+    # load the week once and run every aggregate over it in memory
+    week = MemorySource(dict(source.days(start, end)))
+    by_day = execute(Query(start=start, end=end, group_by='day'), week)
+    days = [(week_end - timedelta(days=6 - i)).isoformat() for i in range(7)]
+    return {
+        'start': start,
+        'end': end,
+        'total_seconds': execute(Query(start=start, end=end), week),
+        'sessions': execute(Query(start=start, end=end, measure='count'), week),
+        'by_day': {d: by_day.get(d, 0) for d in days},
+        'by_category': execute(Query(start=start, end=end, group_by='category'), week),
+        'by_hour': {str(h): v for h, v in execute(
+            Query(start=start, end=end, group_by='hour'), week).items() if h is not None},
+    }
+
+
+def render(summary, path, title):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(8, 3))
+    FigureCanvasAgg(fig)
+    ax_day, ax_cat = fig.subplots(1, 2, gridspec_kw={'width_ratios': [2, 1]})
+    days = list(summary['by_day'])
+    ax_day.bar([d[5:] for d in days], [summary['by_day'][d] / 60 for d in days], color='tab:red')
+    ax_day.set_ylabel('Minutes')
+    ax_day.set_title(title)
+    cats = summary['by_category']
+    if cats:
+        ax_cat.pie([v / 60 for v in cats.values()], labels=list(cats))
+    ax_cat.set_title('By category')
+    fig.tight_layout()
+    fig.savefig(path, dpi=100)
+
+
+def build_report(user_dir, out_dir, week_end, chart=True):
+    """Summarise and render one user; returns ``(user, summary_path)``."""
+    user = _user_name(user_dir)
+    summary = summarise(_data_dir(user_dir), week_end)
+    target = os.path.join(out_dir, user)
+    os.makedirs(target, exist_ok=True)
+    summary_path = os.path.join(target, 'summary.json')
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    if chart:
+        render(summary, os.path.join(target, 'week.png'), f'{user}: week to {summary["end"]}')
+    return user, summary_path
+
+
+def generate(user_dirs, out_dir, week_end=None, workers=None, chart=True):
+    """Build reports in parallel, yielding ``(user, summary_path, error)`` as they finish."""
+    week_end = week_end or date.today()
+    if workers == 1:
+        for d in user_dirs:
+            try:
+                yield (*build_report(d, out_dir, week_end, chart), None)
+            except Exception as exc:
+                yield _user_name(d), None, exc
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(build_report, d, out_dir, week_end, chart): d for d in user_dirs}
+        for future in as_completed(futures):
+            try:
+                yield (*future.result(), None)
+            except Exception as exc:
+                yield _user_name(futures[future]), None, exc
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('out_dir')
+    parser.add_argument('users', nargs='+', help='home or .pomopad directories')
+    parser.add_argument('--week-ending', type=date.fromisoformat, default=date.today())
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--no-charts', action='store_true')
+    args = parser.parse_args(argv)
+    failed = 0
+    for user, path, error in generate(args.users, args.out_dir, args.week_ending,
+                                      args.workers, not args.no_charts):
+        if error:
+            failed += 1
+            print(f'{user}: failed: {error}', file=sys.stderr)
+        else:
+            print(f'{user}: {path}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""Tiered retention for the month files in ``~/.pomopad``.
+
+Recent months stay as they are. Older months are reduced to a small
+per-day/per-category rollup (``rollup_YYYY-MM.json``) and the original
+file is compressed into an archive that is only decompressed when
+someone asks for the raw sessions again.
+"""
+import gzip
+import io
+import json
+import lzma
+import os
+import re
+import threading
+from datetime import datetime
+
+from binary_store import BinaryStore
+import schema
+
+try:
+    import zstandard  # type: ignore
+except ImportError:
+    zstandard = None
+
+KEEP_MONTHS = 3
+
+_MONTH_FILE = re.compile(r'^sessions_(\d{4})-(\d{2})\.(json|pmdb)$')
+_ARCHIVE_FILE = re.compile(r'^sessions_(\d{4})-(\d{2})\.(json|pmdb)\.(gz|xz|zst)$')
+_SUFFIX = {'gzip': 'gz', 'lzma': 'xz', 'zstd': 'zst'}
+
+
+def _compress(raw, codec):
+    if codec == 'gzip':
+        return gzip.compress(raw, 9)
+    if codec == 'lzma':
+        return lzma.compress(raw)
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('zstd compression requires the zstandard package')
+        return zstandard.ZstdCompressor(level=19).compress(raw)
+    raise ValueError(f'unknown codec {codec!r}')
+
+
+def _decompress(raw, suffix):
+    if suffix == 'gz':
+        return gzip.decompress(raw)
+    if suffix == 'xz':
+        return lzma.decompress(raw)
+    if zstandard is None:
+        raise RuntimeError('zstd archives require the zstandard package')
+    return zstandard.ZstdDecompressor().decompress(raw)
+
+
+def _parse(raw, kind):
+    if kind == 'json':
+        return json.loads(raw)
+    with BinaryStore.from_bytes(raw) as store:
+        return store.load()
+
+
+def rollup(data):
+    """Return ``{date: {category: {'elapsed': s, 'count': n}}}`` for a month."""
+    days = {}
+    for date, sessions in data.get('sessions_by_date', {}).items():
+        day = days.setdefault(date, {})
+        for s in sessions.values():
+            cat = s.get('category') or 'Uncategorised'
+            entry = day.setdefault(cat, {'elapsed': 0, 'count': 0})
+            entry['elapsed'] += s.get('elapsed', 0)
+            entry['count'] += 1
+    return days
+
+
+def _cold_months(data_dir, keep_months, today):
+    current = today.year * 12 + today.month - 1
+    for fname in sorted(os.listdir(data_dir)):
+        m = _MONTH_FILE.match(fname)
+        if not m:
+            continue
+        year, month = int(m.group(1)), int(m.group(2))
+        if current - (year * 12 + month - 1) >= keep_months:
+            yield fname, f'{year:04d}-{month:02d}', m.group(3)
+
+
+def compact(data_dir, keep_months=KEEP_MONTHS, codec='gzip', today=None):
+    """Roll up and archive every month older than ``keep_months``.
+
+    Returns the list of months that were compacted.
+    """
+    today = today or datetime.now()
+    done = []
+    for fname, month, kind in _cold_months(data_dir, keep_months, today):
+        path = os.path.join(data_dir, fname)
+        with open(path, 'rb') as f:
+            raw = f.read()
+        # the archive keeps the original bytes, so records the upgrade
+        # rejects are left out of the rollup but not lost
+        if kind == 'json':
+            data = schema.load(io.BytesIO(raw))
+        else:
+            data = schema.upgrade(_parse(raw, kind))
+        summary = {
+            'categories': data.get('categories', {}),
+            'days': rollup(data),
+        }
+        rollup_path = os.path.join(data_dir, f'rollup_{month}.json')
+        with open(rollup_path + '.tmp', 'w') as f:
+            json.dump(summary, f)
+        os.replace(rollup_path + '.tmp', rollup_path)
+
+        archive_path = f'{path}.{_SUFFIX[codec]}'
+        with open(archive_path + '.tmp', 'wb') as f:
+            f.write(_compress(raw, codec))
+        os.replace(archive_path + '.tmp', archive_path)
+        os.remove(path)
+        done.append(month)
+    return done
+
+
+def compact_in_background(data_dir, keep_months=KEEP_MONTHS, codec='gzip', on_done=None):
+    """Run :func:`compact` on a daemon thread so the UI never waits on it."""
+    def run():
+        try:
+            months = compact(data_dir, keep_months, codec)
+        except Exception:
+            months = []
+        if on_done:
+            on_done(months)
+
+    thread = threading.Thread(target=run, name='pomopad-retention', daemon=True)
+    thread.start()
+    return thread
+
+
+def load_rollups(data_dir, start, end):
+    """Return rollup days between ``start`` and ``end`` (ISO dates) shaped
+    like ``sessions_by_date``, with one entry per category."""
+    result = {}
+    for fname in sorted(os.listdir(data_dir)):
+        if not (fname.startswith('rollup_') and fname.endswith('.json')):
+            continue
+        month = fname[len('rollup_'):-len('.json')]
+        if month < start[:7] or month > end[:7]:
+            continue
+        with open(os.path.join(data_dir, fname)) as f:
+            summary = json.load(f)
+        colors = summary.get('categories', {})
+        for date, cats in summary.get('days', {}).items():
+            if start <= date <= end:
+                result[date] = {
+                    cat: {
+                        'elapsed': v['elapsed'],
+                        'category': '' if cat == 'Uncategorised' else cat,
+                        'color': colors.get(cat, '#888888'),
+                        'count': v['count'],
+                        'rollup': True,
+                    }
+                    for cat, v in cats.items()
+                }
+    return result
+
+
+def load_archive(data_dir, month):
+    """Decompress and return the full data of an archived ``YYYY-MM``."""
+    for fname in os.listdir(data_dir):
+        m = _ARCHIVE_FILE.match(fname)
+        if m and f'{m.group(1)}-{m.group(2)}' == month:
+            with open(os.path.join(data_dir, fname), 'rb') as f:
+                raw = _decompress(f.read(), m.group(4))
+            return _parse(raw, m.group(3))
+    return None
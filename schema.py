@@ -0,0 +1,327 @@
+"""Versioned schema for month files and a streaming loader for them.
+
+Version 1 is everything written before the ``schema`` key existed. Those
+files have task sessions without a ``category``, and ``theme`` is either
+a ttkbootstrap theme name or a bool. Version 2 files have every session
+fully populated and ``theme`` as a bool.
+
+:func:`iter_days` parses a file one day at a time. Each session is
+upgraded and validated as soon as its day is decoded, so a caller can
+build its dict, filter days or stream to a new file without a second
+copy of the history in memory. A record that fails validation goes to the
+:class:`Quarantine` and the rest of the file is still loaded. A syntax
+error (e.g. a file cut short by a crash) ends parsing at that point and
+the unread text is quarantined with it.
+"""
+import io
+import json
+import math
+import os
+
+SCHEMA_VERSION = 2
+
+# ttkbootstrap theme names older files stored instead of a dark-mode flag
+DARK_THEMES = {'cyborg', 'darkly', 'solar', 'superhero', 'vapor'}
+
+_WS = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+class CorruptRecord(ValueError):
+    """A record that cannot be upgraded to the current schema."""
+
+
+class Quarantine:
+    """Collects rejected records; ``save`` appends them to a JSON lines file."""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = []
+
+    def add(self, where, value, reason):
+        self.entries.append({'where': where, 'reason': reason, 'value': value})
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self, source=''):
+        if self.path is None or not self.entries:
+            return
+        with open(self.path, 'a') as f:
+            for entry in self.entries:
+                f.write(json.dumps({'file': source, **entry}) + '\n')
+        self.entries.clear()
+
+
+# ----- upgrades -----
+def _number(value, what):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise CorruptRecord(f'{what} is not a number')
+    try:
+        number = float(value)
+    except ValueError:
+        raise CorruptRecord(f'{what} is not a number') from None
+    # json accepts Infinity and NaN, which no session can have
+    if not math.isfinite(number):
+        raise CorruptRecord(f'{what} is not finite')
+    return number
+
+
+def upgrade_session(entry):
+    """Return ``entry`` in the current schema, fixed up in place."""
+    if not isinstance(entry, dict):
+        raise CorruptRecord('session is not an object')
+    elapsed = _number(entry.get('elapsed', 0), 'elapsed')
+    if elapsed < 0:
+        raise CorruptRecord('elapsed is negative')
+    entry['elapsed'] = int(round(elapsed))
+    ts = entry.get('timestamp')
+    entry['timestamp'] = None if ts is None else _number(ts, 'timestamp')
+    for key in ('category', 'notes'):
+        value = entry.get(key)
+        if value is None:
+            entry[key] = ''
+        elif not isinstance(value, str):
+            raise CorruptRecord(f'{key} is not a string')
+    return entry
+
+
+def upgrade_theme(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.lower() in DARK_THEMES
+    return bool(value)
+
+
+def _upgrade_key(key, value, quarantine):
+    """Upgrade a top-level value other than ``sessions_by_date``."""
+    if key == 'theme':
+        return upgrade_theme(value)
+    if key == 'categories':
+        if not isinstance(value, dict):
+            quarantine.add(key, value, 'categories is not an object')
+            return {}
+        for name, color in list(value.items()):
+            if not isinstance(color, str):
+                quarantine.add(f'categories/{name}', value.pop(name), 'colour is not a string')
+        return value
+    if key == 'tasks':
+        if not isinstance(value, list):
+            quarantine.add(key, value, 'tasks is not a list')
+            return []
+        tasks = []
+        for task in value:
+            if isinstance(task, dict) and isinstance(task.get('name'), str):
+                tasks.append(task)
+            else:
+                quarantine.add('tasks', task, 'task has no name')
+        return tasks
+    return value
+
+
+def _finish(data):
+    data.setdefault('sessions_by_date', {})
+    data.setdefault('categories', {})
+    data.setdefault('tasks', [])
+    data['theme'] = upgrade_theme(data.get('theme', True))
+    data['schema'] = max(SCHEMA_VERSION, data.get('schema', 1))
+    return data
+
+
+def upgrade(data, quarantine=None):
+    """Upgrade an already decoded month dict in place (e.g. from a binary file)."""
+    quarantine = quarantine if quarantine is not None else Quarantine()
+    for key in list(data):
+        if key != 'sessions_by_date':
+            data[key] = _upgrade_key(key, data[key], quarantine)
+    for date, sessions in data.get('sessions_by_date', {}).items():
+        for name in list(sessions):
+            try:
+                upgrade_session(sessions[name])
+            except CorruptRecord as exc:
+                quarantine.add(f'sessions_by_date/{date}/{name}', sessions.pop(name), str(exc))
+    return _finish(data)
+
+
+# ----- streaming parser -----
+class _Reader:
+    """A text buffer over a file that is refilled as values are decoded."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # drop what has been consumed so the buffer stays about one chunk long
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                raise json.JSONDecodeError('unexpected end of file', self.buf, self.pos)
+
+    def expect(self, chars):
+        ch = self.peek()
+        if ch not in chars:
+            raise json.JSONDecodeError(f'expected one of {chars!r}', self.buf, self.pos)
+        self.pos += 1
+        return ch
+
+    def value(self):
+        self.peek()
+        # each retry decodes from the value's start again, so a value much
+        # larger than a chunk reads twice as much each time; otherwise the
+        # retries would cost time quadratic in the value's size
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # maybe the value just runs past the end of the buffer
+                if self._fill(size):
+                    size *= 2
+                    continue
+                raise
+            # a number at the end of the buffer may continue in the next chunk
+            if end == len(self.buf) and not self.eof and self._fill(size):
+                size *= 2
+                continue
+            self.pos = end
+            return value
+
+    def rest(self):
+        return self.buf[self.pos:] + self.f.read()
+
+    def members(self):
+        """Yield the keys of an object; the caller reads each value."""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            if not isinstance(key, str):
+                raise json.JSONDecodeError('object key is not a string', self.buf, self.pos)
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}':
+                return
+
+
+def _upgrade_day(date, sessions, quarantine):
+    if not isinstance(sessions, dict):
+        quarantine.add(f'sessions_by_date/{date}', sessions, 'day is not an object')
+        return {}
+    for name in list(sessions):
+        try:
+            upgrade_session(sessions[name])
+        except CorruptRecord as exc:
+            quarantine.add(f'sessions_by_date/{date}/{name}', sessions.pop(name), str(exc))
+    return sessions
+
+
+def iter_days(f, quarantine=None, chunk_size=1 << 16):
+    """Parse a month file incrementally, one day at a time.
+
+    Yields ``('day', date, sessions)`` with the valid, upgraded sessions of
+    each day and ``('key', key, value)`` for the other top-level keys.
+    ``f`` may be a text or binary file object.
+    """
+    if not isinstance(f, io.TextIOBase):
+        f = io.TextIOWrapper(f, encoding='utf-8')
+    quarantine = quarantine if quarantine is not None else Quarantine()
+    reader = _Reader(f, chunk_size)
+    where = ''
+    try:
+        for key in reader.members():
+            where = key
+            if key != 'sessions_by_date':
+                yield 'key', key, _upgrade_key(key, reader.value(), quarantine)
+                continue
+            for date in reader.members():
+                where = f'sessions_by_date/{date}'
+                try:
+                    sessions = reader.value()
+                except json.JSONDecodeError:
+                    # the day is damaged; salvage the sessions before the damage
+                    sessions = {}
+                    try:
+                        for name in reader.members():
+                            where = f'sessions_by_date/{date}/{name}'
+                            sessions[name] = reader.value()
+                    except json.JSONDecodeError:
+                        yield 'day', date, _upgrade_day(date, sessions, quarantine)
+                        raise
+                yield 'day', date, _upgrade_day(date, sessions, quarantine)
+    except json.JSONDecodeError as exc:
+        quarantine.add(where, reader.rest(), f'unreadable from here on: {exc.msg}')
+
+
+def iter_month(f, quarantine=None, chunk_size=1 << 16):
+    """Like :func:`iter_days`, but yields ``('session', date, name, entry)``."""
+    for event in iter_days(f, quarantine, chunk_size):
+        if event[0] == 'key':
+            yield event
+        else:
+            _, date, sessions = event
+            for name, entry in sessions.items():
+                yield 'session', date, name, entry
+
+
+def load(f, quarantine=None, start=None, end=None):
+    """Build a current-schema month dict from ``f``.
+
+    With ``start``/``end`` (ISO dates) only days inside the range are
+    kept; the rest are parsed and dropped one at a time.
+    """
+    data = {'sessions_by_date': {}}
+    days = data['sessions_by_date']
+    for kind, key, value in iter_days(f, quarantine):
+        if kind == 'key':
+            data[key] = value
+        elif value and (start is None or key >= start) and (end is None or key <= end):
+            days.setdefault(key, {}).update(value)
+    return _finish(data)
+
+
+def migrate(src, dst, quarantine=None):
+    """Stream-upgrade the month file ``src`` into ``dst``; return the session count.
+
+    Only one day and the small top-level keys are held at a time.
+    """
+    others = {}
+    count = 0
+    first = True
+    with open(src, 'rb') as fin, open(dst + '.tmp', 'w') as out:
+        out.write('{"sessions_by_date":{')
+        for kind, key, value in iter_days(fin, quarantine):
+            if kind == 'key':
+                others[key] = value
+                continue
+            if not value:
+                continue
+            out.write(('' if first else ',') + json.dumps(key) + ':'
+                      + json.dumps(value, separators=(',', ':')))
+            first = False
+            count += len(value)
+        out.write('}')
+        for key, value in _finish(others).items():
+            if key != 'sessions_by_date':
+                out.write(',' + json.dumps(key) + ':' + json.dumps(value, separators=(',', ':')))
+        out.write('}')
+    os.replace(dst + '.tmp', dst)
+    return count
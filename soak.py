@@ -0,0 +1,365 @@
+"""Accelerated soak test: weeks of simulated use in seconds.
+
+A :class:`VirtualScheduler` stands in for Tk's ``after`` loop and moves a
+:class:`~clock.VirtualClock` straight to the next due callback, so a
+25-minute pomodoro costs only its 1500 tick callbacks. A scripted
+workload starts, stops, saves, renames and deletes sessions every day.
+The harness times every callback and takes a tracemalloc snapshot at the
+end of each simulated day. It fails on memory growth, slow handlers, a
+slowdown between the start and end of the run, or callbacks piling up.
+
+``python soak.py --days 28`` runs the headless target; ``--tk`` drives the
+real ``PomodoroTimer`` (needs a display).
+"""
+import argparse
+from array import array
+import heapq
+import itertools
+import math
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import storage
+from clock import VirtualClock
+from history import Change, UndoStack
+from query import MemorySource, QueryEngine
+from timer_model import TimerModel
+
+DAY = 86400
+
+
+class VirtualScheduler:
+    """``after``/``after_cancel`` on a virtual clock, with per-callback timing."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.latencies = {}
+        self.max_pending = 0
+        self._heap = []
+        self._cancelled = set()
+        self._ids = itertools.count(1)
+
+    def after(self, ms, func, *args):
+        job = next(self._ids)
+        heapq.heappush(self._heap, (self.clock.time() + ms / 1000, job, func, args))
+        self.max_pending = max(self.max_pending, self.pending)
+        return job
+
+    def after_cancel(self, job):
+        self._cancelled.add(job)
+
+    @property
+    def pending(self):
+        return len(self._heap) - len(self._cancelled)
+
+    def run_until(self, until):
+        while self._heap and self._heap[0][0] <= until:
+            due, job, func, args = heapq.heappop(self._heap)
+            if job in self._cancelled:
+                self._cancelled.discard(job)
+                continue
+            if due > self.clock.time():
+                self.clock.advance(due - self.clock.time())
+            t0 = time.perf_counter()
+            func(*args)
+            name = getattr(args[0] if func.__name__ == 'step' and args else func,
+                           '__name__', 'callback')
+            elapsed = time.perf_counter() - t0
+            samples = self.latencies.get(name)
+            if samples is None:
+                samples = self.latencies[name] = array('d')
+            samples.append(elapsed)
+        if until > self.clock.time():
+            self.clock.advance(until - self.clock.time())
+
+
+class HeadlessTarget:
+    """The timer, storage, undo and analytics path of the Tk app, minus widgets."""
+
+    def __init__(self, scheduler, clock):
+        self.scheduler = scheduler
+        self.model = TimerModel(clock=clock)
+        self.data = storage.load_sessions()
+        self.history = UndoStack()
+        self.query = QueryEngine(MemorySource(lambda: self.data['sessions_by_date']))
+        self._job = None
+        self._saved = 0
+
+    # the same catch_up/next_wakeup loop as PomodoroTimer._tick
+    def _tick(self):
+        self._job = None
+        self.model.catch_up()
+        if self.model.state.running:
+            delay = self.model.next_wakeup()
+            self._job = self.scheduler.after(math.ceil(delay * 1000), self._tick)
+
+    def _cancel_tick(self):
+        if self._job is not None:
+            self.scheduler.after_cancel(self._job)
+            self._job = None
+
+    def start(self):
+        if not self.model.state.running:
+            self._cancel_tick()
+            self.model.start()
+            self._tick()
+
+    def stop(self):
+        if self.model.state.running:
+            self.model.catch_up()
+            self.model.stop()
+            self._cancel_tick()
+
+    def _commit(self):
+        storage.save_sessions(self.data)
+        self.query.invalidate()
+        self.query.run(group_by='category')
+
+    def save(self):
+        self._saved += 1
+        name = f'Session {self._saved}'
+        ts = self.model.start_timestamp or self.model.clock.time()
+        date_key = datetime.fromtimestamp(ts).date().isoformat()
+        entry = {'elapsed': self.model.elapsed(), 'timestamp': ts, 'category': '', 'notes': ''}
+        self.data['sessions_by_date'].setdefault(date_key, {})[name] = entry
+        self.history.record(Change('save').session(date_key, name, None, entry))
+        self._commit()
+
+    def _pick(self, rng):
+        keys = [(d, n) for d, s in self.data['sessions_by_date'].items() for n in s]
+        return rng.choice(keys) if keys else None
+
+    def rename(self, rng):
+        picked = self._pick(rng)
+        if picked:
+            date_key, name = picked
+            day = self.data['sessions_by_date'][date_key]
+            entry = day.pop(name)
+            day[name + '*'] = entry
+            self.history.record(Change('rename').session(date_key, name, entry, None)
+                                .session(date_key, name + '*', None, entry))
+            self._commit()
+
+    def delete(self, rng):
+        picked = self._pick(rng)
+        if picked:
+            date_key, name = picked
+            entry = self.data['sessions_by_date'][date_key].pop(name)
+            self.history.record(Change('delete').session(date_key, name, entry, None))
+            self._commit()
+
+    def close(self):
+        pass
+
+
+class TkTarget:
+    """Drive the real :class:`pomodoro.PomodoroTimer` with a virtual scheduler."""
+
+    def __init__(self, scheduler, clock):
+        import tkinter as tk
+        from tkinter import simpledialog
+        from notifications import Dispatcher
+        from pomodoro import PomodoroTimer
+
+        self._simpledialog = simpledialog
+        self.root = tk.Tk()
+        self.root.withdraw()
+        # the live page goes to the temporary data directory and alerts to
+        # a dispatcher without sinks, so a run makes no noise or popups
+        self.app = PomodoroTimer(self.root, scheduler=scheduler, clock=clock,
+                                 live_path=os.path.join(storage._DATA_DIR, 'live.state'),
+                                 notifier=Dispatcher())
+
+    def _pump(self):
+        self.root.update()
+
+    def start(self):
+        self.app.start()
+        self._pump()
+
+    def stop(self):
+        self.app.stop()
+        self._pump()
+
+    def save(self):
+        self.app.quick_save_session()
+        self._pump()
+
+    def _select(self, rng):
+        listbox = self.app.sessions_pane.listbox
+        if listbox.size() == 0:
+            return False
+        listbox.selection_clear(0, 'end')
+        listbox.selection_set(rng.randrange(listbox.size()))
+        return True
+
+    def rename(self, rng):
+        if self._select(rng):
+            ask = self._simpledialog.askstring
+            self._simpledialog.askstring = lambda *a, **k: k.get('initialvalue', 'x') + '*'
+            try:
+                self.app.rename_session()
+            finally:
+                self._simpledialog.askstring = ask
+            self._pump()
+
+    def delete(self, rng):
+        if self._select(rng):
+            self.app.delete_session()
+            self._pump()
+
+    def close(self):
+        # pending writes must land in the temporary data directory
+        self.app.storage.close()
+        self.app.model.events.close()
+        if self.app.live is not None:
+            self.app.live.close()
+        self.root.destroy()
+
+
+def _schedule_day(scheduler, target, day_start, rng):
+    def rename():
+        target.rename(rng)
+
+    def delete():
+        target.delete(rng)
+
+    t = day_start + 9 * 3600
+    actions = []
+    for _ in range(8):
+        work = rng.randrange(15, 30) * 60
+        actions += [(t, target.start), (t + work, target.stop), (t + work + 5, target.save)]
+        if rng.random() < 0.2:
+            actions.append((t + work + 10, rename))
+        if rng.random() < 0.1:
+            actions.append((t + work + 15, delete))
+        t += work + rng.randrange(5, 15) * 60
+
+    # keep a single script callback pending so app callbacks can be counted
+    script = iter(actions)
+
+    def step(action=None):
+        if action is not None:
+            action()
+        nxt = next(script, None)
+        if nxt is not None:
+            when, action = nxt
+            scheduler.after(int((when - scheduler.clock.time()) * 1000), step, action)
+
+    step()
+
+
+def _traced_bytes():
+    # ignore the harness's own bookkeeping
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(False, __file__)])
+    return sum(stat.size for stat in snapshot.statistics('filename'))
+
+
+def _median(values):
+    return statistics.median(values) if values else 0.0
+
+
+def _replay(days, target, seed, trace, quiet):
+    """Replay ``days`` of activity; return the scheduler, memory samples and wall time."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1).timestamp()
+    clock = VirtualClock(start)
+    scheduler = VirtualScheduler(clock)
+    samples = []
+    saved_dir, saved_known = storage._DATA_DIR, dict(storage._known)
+    if trace:
+        tracemalloc.start()
+    wall0 = time.perf_counter()
+    with tempfile.TemporaryDirectory() as tmp:
+        storage._DATA_DIR = tmp
+        storage._known.clear()
+        app = target(scheduler, clock)
+        try:
+            for day in range(days):
+                day_start = start + day * DAY
+                _schedule_day(scheduler, app, day_start, rng)
+                scheduler.run_until(day_start + DAY)
+                if trace:
+                    samples.append(_traced_bytes())
+                    if not quiet:
+                        print(f'day {day + 1}: {samples[-1] / 1024:.0f} KiB traced, '
+                              f'{scheduler.pending} pending', file=sys.stderr)
+        finally:
+            app.close()
+            storage._DATA_DIR = saved_dir
+            storage._known.clear()
+            storage._known.update(saved_known)
+            if trace:
+                tracemalloc.stop()
+    return scheduler, samples, time.perf_counter() - wall0
+
+
+def run_soak(days=14, target=HeadlessTarget, seed=1, max_growth=4 * 1024 * 1024,
+             max_p99=0.05, max_slowdown=3.0, max_pending=16, quiet=True):
+    """Run the soak and return a report dict with a ``failures`` list.
+
+    Latencies come from a plain replay; tracemalloc slows allocation-heavy
+    handlers several times over, so memory is measured in a second replay
+    of the same script. ``max_p99`` and ``max_slowdown`` judge wall-clock
+    time; pass ``None`` to skip them on machines with noisy timing.
+    """
+    failures = []
+    scheduler, _, wall = _replay(days, target, seed, False, True)
+    _, samples, traced_wall = _replay(days, target, seed, True, quiet)
+    wall += traced_wall
+
+    # the first day warms caches and imports; measure growth after it
+    growth = samples[-1] - samples[0] if len(samples) > 1 else 0
+    if growth > max_growth:
+        failures.append(f'memory grew {growth / 1024:.0f} KiB after day 1')
+    if scheduler.max_pending > max_pending:
+        failures.append(f'{scheduler.max_pending} callbacks pending at once')
+    handlers = {}
+    for name, values in scheduler.latencies.items():
+        ordered = sorted(values)
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+        quarter = max(1, len(values) // 4)
+        early, late = _median(values[:quarter]), _median(values[-quarter:])
+        handlers[name] = {'calls': len(values), 'p99': p99, 'early': early, 'late': late}
+        if max_p99 is not None and p99 > max_p99:
+            failures.append(f'{name}: p99 {p99 * 1e3:.1f} ms')
+        if max_slowdown is not None and late > 0.001 and late > early * max_slowdown:
+            failures.append(f'{name}: median {early * 1e3:.2f} -> {late * 1e3:.2f} ms')
+    return {
+        'days': days,
+        'wall_seconds': wall,
+        'memory_samples': samples,
+        'growth_bytes': growth,
+        'max_pending': scheduler.max_pending,
+        'handlers': handlers,
+        'failures': failures,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Accelerated FocusBar soak test')
+    parser.add_argument('--days', type=int, default=14)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--tk', action='store_true', help='drive the Tk app (needs a display)')
+    args = parser.parse_args(argv)
+    report = run_soak(args.days, TkTarget if args.tk else HeadlessTarget, args.seed, quiet=False)
+    print(f"{report['days']} simulated days in {report['wall_seconds']:.1f} s, "
+          f"memory growth {report['growth_bytes'] / 1024:.0f} KiB, "
+          f"max pending callbacks {report['max_pending']}")
+    for name, h in sorted(report['handlers'].items()):
+        print(f"  {name:12} {h['calls']:8d} calls  p99 {h['p99'] * 1e3:7.3f} ms  "
+              f"median {h['early'] * 1e3:.3f} -> {h['late'] * 1e3:.3f} ms")
+    for failure in report['failures']:
+        print(f'FAIL: {failure}')
+    return 1 if report['failures'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,29 +1,219 @@
 import json
+import mmap
 import os
+import re
 from datetime import datetime
 
+from binary_store import BinaryStore, encode
+from clock import SYSTEM_CLOCK
+from event_log import EventLog
+from coordination import file_lock, merge
+from retention import compact_in_background, load_archive, load_rollups
+import schema
+from task_store import TaskStore
+
 _DATA_DIR = os.path.join(os.path.expanduser('~'), '.pomopad')
 os.makedirs(_DATA_DIR, exist_ok=True)
 
+# 'json' (default) or 'binary'; binary files are memory-mapped, not read in
+FORMAT = os.environ.get('POMOPAD_FORMAT', 'json')
+
+# path -> stat signature of the version this process last read or wrote
+_known = {}
+
+_STORED = re.compile(r'^(?:sessions|rollup)_(\d{4}-\d{2})\.(?:json|pmdb)$')
+
+
+def _month_file(month, ext, data_dir=None):
+    return os.path.join(data_dir or _DATA_DIR, f'sessions_{month}.{ext}')
+
+
+def _this_month():
+    return f'{datetime.now():%Y-%m}'
+
+
+def _data_file(month=None):
+    return _month_file(month or _this_month(), 'json')
+
+
+def _binary_file(month=None):
+    return _month_file(month or _this_month(), 'pmdb')
+
+
+def _empty():
+    return {'sessions_by_date': {}, 'categories': {}, 'tasks': [], 'theme': True,
+            'schema': schema.SCHEMA_VERSION}
+
+
+def _signature(st):
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def _quarantine():
+    return schema.Quarantine(os.path.join(_DATA_DIR, 'quarantine.jsonl'))
+
+
+def _load_file(path, binary, quarantine=None):
+    """Decode and upgrade a month file; return it and the file's signature.
+
+    Binary files are memory-mapped and JSON is streamed from the open
+    file, so the raw bytes are never held next to the decoded dict.
+    Rejected records go to ``quarantine``.
+    """
+    with open(path, 'rb') as f:
+        sig = _signature(os.fstat(f.fileno()))
+        if binary:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                with BinaryStore.from_bytes(view) as store:
+                    return schema.upgrade(store.load(), quarantine), sig
+        return schema.load(f, quarantine), sig
+
 
-def _data_file():
-    now = datetime.now()
-    return os.path.join(_DATA_DIR, f'sessions_{now:%Y-%m}.json')
+def current_file(month=None):
+    """Return the path of a month's session file in the active format.
 
+    ``month`` is ``'YYYY-MM'`` and defaults to this month.
+    """
+    return _binary_file(month) if FORMAT == 'binary' else _data_file(month)
 
-def load_sessions():
-    """Return saved sessions and categories from disk."""
+
+def load_sessions(month=None):
+    """Return saved sessions and categories of ``month`` (default: this month)."""
     try:
-        with open(_data_file(), 'r') as f:
-            data = json.load(f)
-            data.setdefault('theme', 'superhero')
-            data.setdefault('tasks', [])
-            return data
+        binary = FORMAT == 'binary' and os.path.exists(_binary_file(month))
+        path = _binary_file(month) if binary else _data_file(month)
+        quarantine = _quarantine()
+        data, sig = _load_file(path, binary, quarantine)
+        # rejected records are kept aside; the next save drops them from the file
+        quarantine.save(os.path.basename(path))
+        # only a file that decoded counts as seen, so a save after a failed
+        # load merges with it instead of writing over it
+        _known[path] = sig
+        return data
     except Exception:
-        return {'sessions_by_date': {}, 'categories': {}, 'tasks': [], 'theme': 'superhero'}
+        return _empty()
+
+
+def load_day(date_key):
+    """Return the sessions recorded on ``date_key`` without loading its month.
+
+    For callers that do not hold the month already. Binary files are
+    memory-mapped and only that day is decoded; JSON files are streamed
+    and every other day is dropped as it is parsed.
+    """
+    return load_range(date_key, date_key).get(date_key, {})
+
+
+def save_sessions(data, base=None, month=None):
+    """Persist sessions and categories of ``month`` (default: this month) to disk.
+
+    Writers are serialised with a lock file. If another instance saved the
+    month since this process last read or wrote it, that instance's
+    records are merged in rather than overwritten; ``base`` is the
+    caller's last loaded or saved copy, without which nothing the caller
+    removed can be told apart from something the other instance added.
+    A file that cannot be decoded is moved aside, never written over.
+    The data actually written is returned so callers can pick up the
+    other instance's records.
+    """
+    binary = FORMAT == 'binary'
+    path = current_file(month)
+    with file_lock(path):
+        try:
+            sig = _signature(os.stat(path))
+        except FileNotFoundError:
+            sig = None
+        if sig is not None and sig != _known.get(path):
+            quarantine = _quarantine()
+            try:
+                theirs, _ = _load_file(path, binary, quarantine)
+            except Exception:
+                os.replace(path, f'{path}.{sig[0]}.unreadable')
+            else:
+                data = merge(base if base is not None else _empty(), data, theirs)
+                quarantine.save(os.path.basename(path))
+        # without indentation the JSON format is about half the size of
+        # indent=2 on disk, and json stays on its C encoder
+        raw = encode(data) if binary else json.dumps(data, separators=(',', ':')).encode()
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp, path)
+        _known[path] = _signature(os.stat(path))
+    return data
+
+
+def month_range(start, end):
+    """Yield ``YYYY-MM`` for every month from ``start`` to ``end`` (ISO dates)."""
+    year, month = int(start[:4]), int(start[5:7])
+    while f'{year:04d}-{month:02d}' <= end[:7]:
+        yield f'{year:04d}-{month:02d}'
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def load_range(start, end, exclude=None, data_dir=None, records=False):
+    """Return ``sessions_by_date`` for ISO dates ``start``..``end`` across months.
+
+    Months still kept in full are read from their session files; months
+    compacted by the retention engine are served from their rollups, or
+    with ``records=True`` decompressed from their archives for callers
+    that need the individual sessions.
+    ``exclude`` names a month (``YYYY-MM``) the caller already has loaded.
+    ``data_dir`` reads another user's ``.pomopad`` directory.
+    """
+    data_dir = data_dir or _DATA_DIR
+    result = load_rollups(data_dir, start, end)
+    for month in month_range(start, end):
+        if month == exclude:
+            continue
+        sessions = {}
+        binary = _month_file(month, 'pmdb', data_dir)
+        text = _month_file(month, 'json', data_dir)
+        try:
+            if os.path.exists(binary):
+                with BinaryStore(binary) as store:
+                    sessions = store.range(start, end)
+            elif os.path.exists(text):
+                with open(text, 'rb') as f:
+                    # days outside the range are parsed and dropped one by one
+                    sessions = schema.load(f, start=start, end=end)['sessions_by_date']
+            elif records:
+                archived = load_archive(data_dir, month)
+                if archived is not None:
+                    sessions = schema.upgrade(archived)['sessions_by_date']
+                    for day in [d for d in result if d[:7] == month]:
+                        del result[day]
+        except Exception:
+            continue
+        result.update({d: s for d, s in sessions.items() if start <= d <= end})
+    return result
+
+
+def history_start(data_dir=None):
+    """Return the first day of the oldest stored month, or ``None``."""
+    months = [
+        m.group(1)
+        for m in map(_STORED.match, os.listdir(data_dir or _DATA_DIR))
+        if m
+    ]
+    return f'{min(months)}-01' if months else None
+
+
+def open_events(month=None):
+    """Open a month's timer event log, ``events_YYYY-MM.log`` (default: this month)."""
+    return EventLog.open(os.path.join(_DATA_DIR, f'events_{month or _this_month()}.log'))
+
+
+def sync_state_file():
+    """Path of the device's sync state, kept apart from the month files."""
+    return os.path.join(_DATA_DIR, 'sync_state.json')
+
+
+def open_tasks(seed=(), clock=SYSTEM_CLOCK):
+    """Open the todo list store; ``seed`` imports tasks from a month file."""
+    return TaskStore.open(_DATA_DIR, seed, clock)
 
 
-def save_sessions(data):
-    """Persist sessions and categories to disk."""
-    with open(_data_file(), 'w') as f:
-        json.dump(data, f, indent=2)
+def compact_history(on_done=None):
+    """Compact cold months in the background; see :mod:`retention`."""
+    return compact_in_background(_DATA_DIR, on_done=on_done)
@@ -0,0 +1,264 @@
+"""Asyncio front end to :mod:`storage` shared by the UIs and scripts.
+
+:class:`StorageService` keeps this month's data in memory, so reads come
+from the cache. File I/O runs on a small thread pool, and a semaphore
+bounds how many jobs run at once. Mutations update the cache at once
+and are written in batches: edits made within ``flush_delay`` seconds of
+each other are saved together.
+
+Records another process wrote reach the cache on :meth:`reload`, or
+when a write finds the file changed. File watchers in ``watchers`` are
+told about the service's own writes when they land, so those are not
+mistaken for another process's. Functions in ``listeners`` are
+then called on the loop thread with ``(upserts, removals, categories)``,
+in the format of :func:`coordination.diff_sessions`.
+
+Code that is not async itself, such as Tk callbacks or pywebview's bridge
+thread, uses :class:`StorageThread`. It runs the service on its own event
+loop and hands back ``concurrent.futures.Future`` objects::
+
+    storage = StorageThread()
+    storage.submit(storage.service.mutate(add_category)).result()
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime
+from functools import partial
+import json
+import threading
+
+import storage
+from clock import SYSTEM_CLOCK
+from coordination import diff_sessions, merge
+from query import HistorySource, MemorySource, Query, execute, StorageSource
+
+
+def snapshot(data):
+    """Deep copy of a month dict that shares nothing with ``data``."""
+    return json.loads(json.dumps(data, separators=(',', ':')))
+
+
+class StorageService:
+    def __init__(self, max_workers=2, flush_delay=0.25, max_results=128, clock=SYSTEM_CLOCK):
+        self.flush_delay = flush_delay
+        self.clock = clock
+        self.max_results = max_results
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix='storage')
+        self._slots = asyncio.Semaphore(max_workers)
+        self._write_lock = asyncio.Lock()
+        self._data = None
+        # what this service last read from or wrote to disk, for merges
+        self._base = None
+        self._loading = None
+        self._dirty = False
+        self._flush_task = None
+        self._results = {}
+        self._inflight = {}
+        self.listeners = []
+        # coordination.FileWatcher objects that should not report our writes
+        self.watchers = []
+
+    async def _run(self, fn, *args):
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, partial(fn, *args))
+
+    def _month(self):
+        return f'{datetime.fromtimestamp(self.clock.time()):%Y-%m}'
+
+    # ----- reads -----
+    async def load(self):
+        """Return the cached month dict, reading it on first use.
+
+        Callers share the returned dict; change it through :meth:`mutate`.
+        """
+        if self._data is None:
+            if self._loading is None:
+                self._loading = asyncio.ensure_future(self._run(storage.load_sessions, self._month()))
+            try:
+                data = await self._loading
+            finally:
+                self._loading = None
+            if self._data is None:
+                self._data = data
+                self._base = snapshot(data)
+        return self._data
+
+    async def reload(self):
+        """Fold in what another process wrote; return a copy of the result."""
+        theirs = await self._run(storage.load_sessions, self._month())
+        if self._data is None:
+            self._data = theirs
+        else:
+            self._fold(merge(self._base, self._data, theirs))
+        self._base = snapshot(theirs)
+        return snapshot(self._data)
+
+    async def day(self, date_key):
+        """Return a copy of the sessions recorded on ``date_key``.
+
+        Served from the cache once this month is loaded, pending edits
+        included. Other days, or any day before the first load, are read
+        with :func:`storage.load_day` without loading their month.
+        """
+        if self._data is not None and date_key[:7] == self._month():
+            return snapshot(self._data['sessions_by_date'].get(date_key, {}))
+        return await self._run(storage.load_day, date_key)
+
+    def _fold(self, merged):
+        """Make ``merged`` the cache contents and tell listeners what changed."""
+        upserts, removals = diff_sessions(self._data.get('sessions_by_date', {}),
+                                          merged.get('sessions_by_date', {}))
+        categories = merged.get('categories', {})
+        changed = upserts or removals or categories != self._data.get('categories', {})
+        self._data.clear()
+        self._data.update(merged)
+        self._results.clear()
+        if changed:
+            # listeners may hand these to another thread, so send copies
+            upserts, categories = snapshot(upserts), dict(categories)
+            for listener in self.listeners:
+                listener(upserts, removals, categories)
+
+    async def query(self, query=None, **filters):
+        """Run a :class:`query.Query`; identical concurrent queries share one run."""
+        query = query or Query(**filters)
+        if query in self._results:
+            result = self._results.pop(query)
+            self._results[query] = result
+            return result
+        if query not in self._inflight:
+            self._inflight[query] = asyncio.ensure_future(self._query(query))
+        return await asyncio.shield(self._inflight[query])
+
+    async def _query(self, query):
+        try:
+            month = self._month()
+            if self._data is None:
+                result = await self._run(execute, query, StorageSource(clock=self.clock))
+            elif query.start is not None and query.start[:7] >= month:
+                # only this month: answer from the cache, pending edits included
+                result = execute(query, MemorySource(self._data['sessions_by_date']))
+            else:
+                # older months come from disk on a worker; it gets its own
+                # copy of the cached days so edits here cannot race with it
+                days = {d: s for d, s in self._data['sessions_by_date'].items()
+                        if (query.start is None or d >= query.start)
+                        and (query.end is None or d <= query.end)}
+                result = await self._run(execute, query, HistorySource(snapshot(days), clock=self.clock))
+        finally:
+            self._inflight.pop(query, None)
+        self._results[query] = result
+        while len(self._results) > self.max_results:
+            del self._results[next(iter(self._results))]
+        return result
+
+    # ----- writes -----
+    async def mutate(self, fn, wait=False):
+        """Apply ``fn(data)`` to the cache and schedule a write.
+
+        Returns whatever ``fn`` returns. With ``wait=True`` the call also
+        waits until the change is on disk.
+        """
+        data = await self.load()
+        result = fn(data)
+        await self._changed(wait)
+        return result
+
+    async def update(self, base, ours, wait=False):
+        """Fold the edits a caller made to its own copy since ``base``.
+
+        For front-ends that keep their own month dict: ``base`` is what
+        they last sent and ``ours`` is their current state. Both must be
+        copies the caller no longer changes; :func:`snapshot` makes them.
+        """
+        data = await self.load()
+        merged = merge(base, ours, data)
+        data.clear()
+        data.update(merged)
+        await self._changed(wait)
+
+    async def _changed(self, wait):
+        self._dirty = True
+        self._results.clear()
+        if wait:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.ensure_future(self._flush_later())
+
+    async def _flush_later(self):
+        try:
+            # edits made while a write was in flight go out in the next batch
+            while self._dirty:
+                await asyncio.sleep(self.flush_delay)
+                await self.flush()
+        finally:
+            self._flush_task = None
+
+    async def flush(self):
+        """Write pending changes now."""
+        async with self._write_lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            ours = snapshot(self._data)
+            try:
+                written = await self._run(self._save, ours, self._base, self._month())
+            except BaseException:
+                self._dirty = True
+                raise
+            if written is ours:
+                self._base = ours
+                return
+            # another process saved first; keep its records and any edits
+            # made here while the write was running
+            self._base = snapshot(written)
+            self._fold(merge(ours, self._data, written))
+
+    def _save(self, data, base, month):
+        # on a worker thread; the watchers skip this write, wherever it lands
+        with ExitStack() as stack:
+            for watcher in self.watchers:
+                stack.enter_context(watcher.own_write(storage.current_file(month)))
+            return storage.save_sessions(data, base, month)
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        self._executor.shutdown(wait=True)
+
+
+class StorageThread:
+    """Run a :class:`StorageService` on a background event loop."""
+
+    def __init__(self, **options):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name='storage-loop',
+                                        daemon=True)
+        self._thread.start()
+        self.service = self.call(self._create, options)
+
+    @staticmethod
+    async def _create(options):
+        return StorageService(**options)
+
+    def submit(self, coro):
+        """Schedule ``coro`` on the service loop; return a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, fn, *args):
+        """Run ``await fn(*args)`` on the service loop and wait for the result."""
+        return self.submit(fn(*args)).result()
+
+    def close(self):
+        if not self.loop.is_running():
+            return
+        try:
+            self.call(self.service.close)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.close()
@@ -0,0 +1,363 @@
+"""Delta replication of session data between devices.
+
+Every session record gets a stable ``id`` and every replicated key
+(session, category or task) carries the device and per-device sequence
+number of its last write. A peer's version vector says which of those
+writes it has already seen, so only newer ones are sent. Conflicts are
+resolved last-writer-wins on ``(wall time, device)``; every device
+applies the same rule, so all of them end up with the same data.
+
+Sync metadata (device id, version vector, per-key stamps) is kept in a
+state dict of its own, which ``main`` saves as ``sync_state.json`` in
+the data directory. It is not part of any month file, so the device and
+its history survive a month rollover. An engine may cover only the
+records from ``since`` on; older records are neither sent nor treated
+as deleted.
+"""
+from datetime import date, timedelta
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+
+from coordination import file_lock
+
+
+def _task_key(task):
+    # the same identity the month-file merge uses: id, or the name for
+    # tasks saved before they had one
+    return task.get('id') or task.get('name', '')
+
+
+def _digest(value):
+    raw = json.dumps(value, sort_keys=True, separators=(',', ':')).encode()
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+class SyncEngine:
+    """Tracks local edits of one data dict and merges remote changes into it."""
+
+    def __init__(self, data, device=None, state=None, since=None):
+        self.data = data
+        meta = {} if state is None else state
+        # older versions kept the metadata in the month file
+        legacy = data.pop('sync', None)
+        if legacy and not meta:
+            meta.update(legacy)
+        meta.setdefault('device', device or uuid.uuid4().hex[:12])
+        meta.setdefault('seq', 0)
+        meta.setdefault('vv', {})
+        # key -> [device, seq, wall, digest]; digest None marks a tombstone
+        meta.setdefault('keys', {})
+        # session key -> date, to tell records outside ``since`` apart
+        meta.setdefault('dates', {})
+        self.meta = meta
+        self.since = since
+        self._index = {}
+
+    @property
+    def device(self):
+        return self.meta['device']
+
+    def version_vector(self):
+        return dict(self.meta['vv'])
+
+    def _covered(self, key):
+        day = self.meta['dates'].get(key)
+        return self.since is None or day is None or day >= self.since
+
+    # ----- local state -----
+    def _values(self):
+        """Return ``{key: value}`` for everything currently in ``data``."""
+        values = {}
+        self._index = {}
+        for date, sessions in self.data.get('sessions_by_date', {}).items():
+            for name, entry in sessions.items():
+                if 'id' not in entry:
+                    entry['id'] = uuid.uuid4().hex
+                key = 's:' + entry['id']
+                values[key] = {'date': date, 'name': name, 'entry': entry}
+                self._index[key] = (date, name)
+                self.meta['dates'][key] = date
+        for name, color in self.data.get('categories', {}).items():
+            values['c:' + name] = color
+        for task in self.data.get('tasks', []):
+            values['t:' + _task_key(task)] = task
+        return values
+
+    def _stamp(self, key, digest):
+        self.meta['seq'] += 1
+        seq = self.meta['seq']
+        self.meta['keys'][key] = [self.device, seq, time.time(), digest]
+        self.meta['vv'][self.device] = seq
+
+    def scan(self):
+        """Record local edits made since the last scan; return how many."""
+        keys = self.meta['keys']
+        values = self._values()
+        # records that aged out of the window are forgotten, not deleted
+        for key in [k for k in keys if not self._covered(k)]:
+            del keys[key]
+            self.meta['dates'].pop(key, None)
+        changed = 0
+        for key, value in values.items():
+            digest = _digest(value)
+            known = keys.get(key)
+            if known is None or known[3] != digest:
+                self._stamp(key, digest)
+                changed += 1
+        for key, known in keys.items():
+            if known[3] is not None and key not in values:
+                self._stamp(key, None)
+                changed += 1
+        return changed
+
+    # ----- replication -----
+    def changes_since(self, vv):
+        """Return the ops a peer with version vector ``vv`` has not seen."""
+        values = None
+        ops = []
+        for key, (device, seq, wall, digest) in self.meta['keys'].items():
+            if seq <= vv.get(device, 0) or not self._covered(key):
+                continue
+            if values is None:
+                values = self._values()
+            ops.append({'k': key, 'd': device, 's': seq, 'w': wall,
+                        'v': values.get(key) if digest is not None else None})
+        return ops
+
+    def apply(self, ops):
+        """Merge remote ops; return the number that changed local data."""
+        keys = self.meta['keys']
+        vv = self.meta['vv']
+        if ops:
+            self._values()
+        applied = 0
+        for op in sorted(ops, key=lambda o: (o['d'], o['s'])):
+            vv[op['d']] = max(vv.get(op['d'], 0), op['s'])
+            if not self._in_window(op):
+                continue
+            known = keys.get(op['k'])
+            if known is not None and (known[2], known[0]) >= (op['w'], op['d']):
+                continue
+            value = op['v']
+            self._write(op['k'], value)
+            keys[op['k']] = [op['d'], op['s'], op['w'], None if value is None else _digest(value)]
+            applied += 1
+        return applied
+
+    def _in_window(self, op):
+        if op['k'][0] != 's' or self.since is None:
+            return True
+        value = op['v']
+        if value is None:
+            return self._covered(op['k'])
+        return value['date'] >= self.since
+
+    def _write(self, key, value):
+        kind, ident = key[0], key[2:]
+        if kind == 'c':
+            cats = self.data.setdefault('categories', {})
+            if value is None:
+                cats.pop(ident, None)
+            else:
+                cats[ident] = value
+        elif kind == 't':
+            tasks = self.data.setdefault('tasks', [])
+            for i, task in enumerate(tasks):
+                if _task_key(task) == ident:
+                    if value is None:
+                        del tasks[i]
+                    else:
+                        tasks[i] = value
+                    break
+            else:
+                if value is not None:
+                    tasks.append(value)
+        else:
+            self._write_session(key, ident, value)
+
+    def _write_session(self, key, rid, value):
+        sessions = self.data.setdefault('sessions_by_date', {})
+        old = self._index.pop(key, None)
+        if old is not None:
+            day = sessions.get(old[0], {})
+            if day.get(old[1], {}).get('id') == rid:
+                del day[old[1]]
+            if not day:
+                sessions.pop(old[0], None)
+        if value is None:
+            return
+        date, name, entry = value['date'], value['name'], value['entry']
+        self.meta['dates'][key] = date
+        day = sessions.setdefault(date, {})
+        holder = day.get(name)
+        if holder is not None and holder.get('id') != rid:
+            # two devices created the same name on the same day: the record
+            # with the larger id moves aside, which every device agrees on
+            if rid > holder.get('id', ''):
+                name = f"{name} ({rid[:6]})"
+            else:
+                moved = f"{name} ({holder['id'][:6]})"
+                day[moved] = holder
+                self._index['s:' + holder['id']] = (date, moved)
+        day[name] = entry
+        self._index[key] = (date, name)
+
+    def sync_with(self, other):
+        """Exchange changes with another engine in the same process."""
+        self.scan()
+        other.scan()
+        # round-trip through JSON so the two stores never share record dicts
+        theirs = json.loads(json.dumps(other.changes_since(self.version_vector())))
+        mine = json.loads(json.dumps(self.changes_since(other.version_vector())))
+        return self.apply(theirs), other.apply(mine)
+
+
+class DirectoryTransport:
+    """Exchange changes through a shared directory (e.g. a synced folder).
+
+    Each device publishes its version vector as ``vv_<device>.json`` and,
+    for every peer it knows about, the ops that peer has not yet seen as
+    ``ops_<peer>_from_<device>.json``.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _write(self, name, payload):
+        tmp = os.path.join(self.path, name + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp, os.path.join(self.path, name))
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def pull(self, engine):
+        applied = 0
+        prefix = f'ops_{engine.device}_from_'
+        for fname in sorted(os.listdir(self.path)):
+            if fname.startswith(prefix) and fname.endswith('.json'):
+                ops = self._read(fname)
+                if ops:
+                    applied += engine.apply(ops)
+        self._write(f'vv_{engine.device}.json', engine.version_vector())
+        return applied
+
+    def push(self, engine):
+        sent = 0
+        for fname in os.listdir(self.path):
+            if not (fname.startswith('vv_') and fname.endswith('.json')):
+                continue
+            peer = fname[3:-5]
+            if peer == engine.device:
+                continue
+            ops = engine.changes_since(self._read(fname) or {})
+            self._write(f'ops_{peer}_from_{engine.device}.json', ops)
+            sent += len(ops)
+        self._write(f'vv_{engine.device}.json', engine.version_vector())
+        return sent
+
+    def sync(self, engine):
+        """Scan local edits, pull what peers left for us, then push ours."""
+        engine.scan()
+        applied = self.pull(engine)
+        return applied, self.push(engine)
+
+
+def _send(sock, payload):
+    sock.sendall(json.dumps(payload).encode() + b'\n')
+
+
+def _recv(stream):
+    line = stream.readline()
+    if not line:
+        raise ConnectionError('peer closed the connection')
+    return json.loads(line)
+
+
+def exchange(engine, sock, initiator):
+    """Two-way delta exchange over a connected socket.
+
+    Both ends call this; the one that opened the connection passes
+    ``initiator=True``. Returns ``(applied, sent)``.
+    """
+    engine.scan()
+    stream = sock.makefile('rb')
+    try:
+        if initiator:
+            _send(sock, {'vv': engine.version_vector()})
+            reply = _recv(stream)
+            applied = engine.apply(reply['ops'])
+            ops = engine.changes_since(reply['vv'])
+            _send(sock, {'ops': ops})
+        else:
+            hello = _recv(stream)
+            ops = engine.changes_since(hello['vv'])
+            _send(sock, {'ops': ops, 'vv': engine.version_vector()})
+            applied = engine.apply(_recv(stream)['ops'])
+    finally:
+        stream.close()
+    return applied, len(ops)
+
+
+def _load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path, state):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def main(argv=None, today=None):
+    """``python sync.py DIRECTORY`` syncs this and last month's data through a shared folder."""
+    from storage import load_sessions, save_sessions, sync_state_file
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 1:
+        print('usage: sync.py DIRECTORY', file=sys.stderr)
+        return 2
+    today = today or date.today()
+    this = f'{today:%Y-%m}'
+    months = [f'{today.replace(day=1) - timedelta(days=1):%Y-%m}', this]
+    path = sync_state_file()
+    with file_lock(path):
+        loaded = {month: load_sessions(month) for month in months}
+        # copies to merge against if the app saves while the sync runs
+        bases = {month: json.loads(json.dumps(d)) for month, d in loaded.items()}
+        # categories and tasks come from this month; sessions from both
+        data = dict(loaded[this])
+        data['sessions_by_date'] = {
+            day: sessions for month in months
+            for day, sessions in loaded[month].get('sessions_by_date', {}).items()}
+        engine = SyncEngine(data, state=_load_state(path), since=months[0] + '-01')
+        applied, sent = DirectoryTransport(argv[0]).sync(engine)
+        for month in months:
+            out = dict(data if month == this else loaded[month])
+            # anything dated outside both months stays where it was found
+            out['sessions_by_date'] = {
+                day: sessions for day, sessions in data['sessions_by_date'].items()
+                if day[:7] == month or (month == this and day[:7] not in months)}
+            save_sessions(out, bases[month], month)
+        _save_state(path, engine.meta)
+    print(f'received {applied} change(s), sent {sent}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
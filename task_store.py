@@ -0,0 +1,341 @@
+"""Todo list storage with stable ids, indexes and an append-only journal.
+
+Tasks stay plain dicts (``name``, ``note``, ``done`` plus ``id``,
+``order``, ``priority``, ``archived``, ``pomodoros``, ``focused`` and an
+``updated`` wall-clock stamp) so they still fit in the month files. The store keeps them partitioned into
+active, done and archived sets, with an order index for display and a
+priority index for picking the next task.
+
+Each edit is appended to ``tasks.log`` as one JSON line instead of
+rewriting everything. The log is folded into ``tasks.json`` when it
+grows past ``COMPACT_AFTER`` lines. Several instances may share the
+files: writers hold a lock, replay what the others appended before
+adding their own line, and compaction starts a new log file that the
+others notice and reload from.
+"""
+from bisect import bisect_left, insort
+import json
+import os
+import uuid
+
+from clock import SYSTEM_CLOCK
+from coordination import file_lock
+
+COMPACT_AFTER = 500
+
+
+class TaskStore:
+    def __init__(self, tasks=(), path=None, clock=SYSTEM_CLOCK):
+        self.path = path
+        self.clock = clock
+        self._tasks = {}
+        self._order = []       # (order, id) for visible (not archived) tasks
+        self._priority = []    # (-priority, order, id) for active tasks
+        self._done = set()
+        self._archived = set()
+        self._next_order = 0
+        self._journal = None
+        self._journal_lines = 0
+        # where this store has read the journal up to, and which file it was
+        self._journal_pos = 0
+        self._journal_ino = None
+        # set when ops from other instances were applied, see changed_elsewhere
+        self._foreign = False
+        for task in tasks:
+            self._insert(self._normalise(dict(task)))
+
+    # ----- persistence -----
+    @classmethod
+    def open(cls, directory, seed=(), clock=SYSTEM_CLOCK):
+        """Load ``tasks.json`` and replay ``tasks.log`` from ``directory``.
+
+        ``seed`` (e.g. the ``tasks`` list of a month file) is folded in
+        with :meth:`fold`, so tasks that reached the month file through
+        sync or another instance show up here.
+        """
+        store = cls(path=directory, clock=clock)
+        with file_lock(store._journal_path):
+            torn = store._reload()
+            first = not os.path.exists(os.path.join(directory, 'tasks.json'))
+            if first:
+                for task in seed:
+                    store._insert(store._normalise(dict(task)))
+            if torn or first or store._journal_lines > COMPACT_AFTER:
+                store._compact()
+        store._foreign = False
+        if not first:
+            store.fold(seed)
+        return store
+
+    @property
+    def _journal_path(self):
+        return os.path.join(self.path, 'tasks.log')
+
+    def _reload(self):
+        """Rebuild everything from the snapshot and journal; True if a line was torn."""
+        self.close()
+        self._tasks.clear()
+        self._order.clear()
+        self._priority.clear()
+        self._done.clear()
+        self._archived.clear()
+        self._journal_lines = 0
+        self._journal_pos = 0
+        self._foreign = True
+        snapshot = os.path.join(self.path, 'tasks.json')
+        if os.path.exists(snapshot):
+            with open(snapshot) as f:
+                for task in json.load(f):
+                    self._insert(self._normalise(task))
+        try:
+            self._journal_ino = os.stat(self._journal_path).st_ino
+        except FileNotFoundError:
+            self._journal_ino = None
+        return self._read_journal()
+
+    def _read_journal(self):
+        """Replay lines appended since the last read; True if one was torn.
+
+        Another instance may have appended to the journal, or compacted it
+        into a new file, in which case everything is reloaded.
+        """
+        try:
+            st = os.stat(self._journal_path)
+        except FileNotFoundError:
+            return False
+        if st.st_ino != self._journal_ino:
+            return self._reload()
+        if st.st_size == self._journal_pos:
+            return False
+        torn = False
+        with open(self._journal_path, 'rb') as f:
+            f.seek(self._journal_pos)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # still being written, or cut short by a crash
+                    torn = True
+                    break
+                self._journal_pos += len(line)
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    # a crash mid-append left a torn line, and the next
+                    # append landed on the same line
+                    torn = True
+                    continue
+                self._replay(op)
+                self._journal_lines += 1
+                self._foreign = True
+        return torn
+
+    def refresh(self):
+        """Fold in what other instances wrote to the journal; True if anything did.
+
+        Ops that an edit of ours replayed before appending count as well,
+        so a view that draws rows by :meth:`position` knows to rebuild.
+        """
+        if self.path is None:
+            return False
+        with file_lock(self._journal_path):
+            self._read_journal()
+        return self.changed_elsewhere()
+
+    def changed_elsewhere(self):
+        """True if ops from other instances were applied since the last call."""
+        foreign, self._foreign = self._foreign, False
+        return foreign
+
+    def fold(self, tasks):
+        """Merge tasks from elsewhere (e.g. a month file); return how many changed.
+
+        A task wins if this store lacks it or holds an older ``updated``
+        stamp. Tasks without an id, from older files, match by name.
+        Tasks missing from ``tasks`` are kept: this store cannot tell a
+        deletion elsewhere from a task not yet saved there.
+        """
+        names = {t['name'] for t in self._tasks.values()}
+        changed = 0
+        for task in tasks:
+            known = self._tasks.get(task.get('id'))
+            if known is None and 'id' not in task and task.get('name') in names:
+                continue
+            if known is not None and task.get('updated', 0) <= known.get('updated', 0):
+                continue
+            self._log({'op': 'put', 'task': dict(task)})
+            changed += 1
+        return changed
+
+    def _replay(self, op):
+        if op['op'] == 'put':
+            task = op['task']
+            if task['id'] in self._tasks:
+                self._remove(task['id'])
+            self._insert(task)
+        elif op['op'] == 'del':
+            if op['id'] in self._tasks:
+                self._remove(op['id'])
+
+    def _log(self, op):
+        if self.path is None:
+            self._apply(op)
+            return
+        with file_lock(self._journal_path):
+            # edits from other instances go first, then ours on top of them;
+            # a torn tail left by a crash is folded away before appending
+            if self._read_journal():
+                self._compact()
+            self._apply(op)
+            if self._journal is None:
+                self._journal = open(self._journal_path, 'ab')
+                self._journal_ino = os.fstat(self._journal.fileno()).st_ino
+            self._journal.write(json.dumps(op, separators=(',', ':')).encode() + b'\n')
+            self._journal.flush()
+            self._journal_pos = self._journal.tell()
+            self._journal_lines += 1
+            if self._journal_lines > COMPACT_AFTER:
+                self._compact()
+
+    def _apply(self, op):
+        # a new task takes the next order only now, after the other
+        # instances' adds were replayed, so concurrent adds never share one
+        if op['op'] == 'put':
+            self._normalise(op['task'])
+        self._replay(op)
+
+    def compact(self):
+        """Write a full snapshot and start a fresh journal."""
+        if self.path is None:
+            return
+        with file_lock(self._journal_path):
+            self._read_journal()
+            self._compact()
+
+    def _compact(self):
+        # the caller holds the lock and has read the whole journal
+        snapshot = os.path.join(self.path, 'tasks.json')
+        with open(snapshot + '.tmp', 'w') as f:
+            json.dump(self.tasks(), f)
+        os.replace(snapshot + '.tmp', snapshot)
+        self.close()
+        # a new file, so other instances see a different inode and reload
+        with open(self._journal_path + '.tmp', 'wb'):
+            pass
+        os.replace(self._journal_path + '.tmp', self._journal_path)
+        self._journal_ino = os.stat(self._journal_path).st_ino
+        self._journal_pos = 0
+        self._journal_lines = 0
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+
+    # ----- indexes -----
+    def _normalise(self, task):
+        task.setdefault('id', uuid.uuid4().hex)
+        task.setdefault('note', '')
+        task.setdefault('done', False)
+        task.setdefault('archived', False)
+        task.setdefault('priority', 0)
+        task.setdefault('pomodoros', 0)
+        task.setdefault('focused', 0)
+        if 'order' not in task:
+            task['order'] = self._next_order
+        return task
+
+    def _insert(self, task):
+        tid = task['id']
+        self._tasks[tid] = task
+        self._next_order = max(self._next_order, task['order'] + 1)
+        if task['archived']:
+            self._archived.add(tid)
+            return
+        insort(self._order, (task['order'], tid))
+        if task['done']:
+            self._done.add(tid)
+        else:
+            insort(self._priority, (-task['priority'], task['order'], tid))
+
+    def _remove(self, tid):
+        task = self._tasks.pop(tid)
+        if tid in self._archived:
+            self._archived.discard(tid)
+            return task
+        del self._order[bisect_left(self._order, (task['order'], tid))]
+        if tid in self._done:
+            self._done.discard(tid)
+        else:
+            del self._priority[bisect_left(self._priority, (-task['priority'], task['order'], tid))]
+        return task
+
+    def _update(self, tid, **changes):
+        task = self._remove(tid)
+        task.update(changes, updated=self.clock.time())
+        self._insert(task)
+        self._log({'op': 'put', 'task': task})
+        return task
+
+    # ----- queries -----
+    def __len__(self):
+        return len(self._tasks)
+
+    def __contains__(self, tid):
+        return tid in self._tasks
+
+    def get(self, tid):
+        return self._tasks[tid]
+
+    def tasks(self):
+        """Every task, archived ones included, in display order."""
+        return sorted(self._tasks.values(), key=lambda t: t['order'])
+
+    def visible(self):
+        """Ids of non-archived tasks in display order."""
+        return [tid for _, tid in self._order]
+
+    def position(self, tid):
+        """Row of ``tid`` among :meth:`visible` tasks, in O(log n)."""
+        task = self._tasks[tid]
+        return bisect_left(self._order, (task['order'], tid))
+
+    def active(self):
+        return [tid for _, tid in self._order if tid not in self._done]
+
+    def done(self):
+        return [tid for _, tid in self._order if tid in self._done]
+
+    def archived(self):
+        return sorted(self._archived, key=lambda t: self._tasks[t]['order'])
+
+    def next_task(self):
+        """The highest-priority active task, oldest first on ties."""
+        return self._priority[0][2] if self._priority else None
+
+    # ----- edits -----
+    def add(self, name, note='', priority=0):
+        task = {'name': name, 'note': note, 'priority': priority, 'updated': self.clock.time()}
+        self._log({'op': 'put', 'task': task})
+        return task['id']
+
+    def toggle(self, tid):
+        return self._update(tid, done=not self._tasks[tid]['done'])
+
+    def edit(self, tid, **changes):
+        return self._update(tid, **changes)
+
+    def delete(self, tid):
+        self._remove(tid)
+        self._log({'op': 'del', 'id': tid})
+
+    def archive_done(self):
+        """Move every done task out of the visible list; return their ids."""
+        ids = self.done()
+        for tid in ids:
+            self._update(tid, archived=True)
+        return ids
+
+    def record_focus(self, tid, seconds, pomodoros=0):
+        """Add focused time to a task's rollup."""
+        task = self._tasks[tid]
+        return self._update(tid, focused=task['focused'] + seconds,
+                            pomodoros=task['pomodoros'] + pomodoros)
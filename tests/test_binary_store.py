@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from binary_store import BinaryStore, write_binary
+
+
+DATA = {
+    'sessions_by_date': {
+        '2024-05-02': {
+            'Write report': {'elapsed': 1500, 'timestamp': 1714640000.5,
+                             'notes': 'draft', 'color': '#aabbcc',
+                             'intervals': [[1714640000.5, 1714641500.5]]},
+        },
+        '2024-05-01': {
+            'Reading': {'elapsed': 900, 'timestamp': None, 'category': 'Study', 'notes': ''},
+            '25:00/25:00': {'elapsed': 1500, 'timestamp': 1714550000.0, 'category': 'Study', 'notes': ''},
+        },
+    },
+    'categories': {'Study': '#00ff00'},
+    'tasks': [{'name': 'Write report', 'note': '', 'done': False}],
+    'theme': True,
+}
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'sessions.pmdb')
+    write_binary(path, DATA)
+    with BinaryStore(path) as store:
+        assert store.days() == ['2024-05-01', '2024-05-02']
+        assert store.load() == DATA
+
+
+def test_single_day_and_missing_day(tmp_path):
+    path = str(tmp_path / 'sessions.pmdb')
+    write_binary(path, DATA)
+    with BinaryStore(path) as store:
+        assert store.day('2024-05-02') == DATA['sessions_by_date']['2024-05-02']
+        assert store.day('2024-06-01') == {}
+        assert store.meta()['categories'] == {'Study': '#00ff00'}
+
+
+def test_json_month_files_are_written_compact(tmp_path, monkeypatch):
+    import json
+    import storage
+
+    monkeypatch.setattr(storage, '_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(storage, 'FORMAT', 'json')
+    monkeypatch.setattr(storage, '_known', {})
+    storage.save_sessions(DATA)
+    raw = Path(storage.current_file()).read_text()
+    assert '\n' not in raw and len(raw) < len(json.dumps(DATA, indent=2))
+    loaded = storage.load_sessions()['sessions_by_date']
+    assert {d: set(s) for d, s in loaded.items()} == {
+        d: set(s) for d, s in DATA['sessions_by_date'].items()}
@@ -0,0 +1,83 @@
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import storage
+from coordination import FileWatcher, apply_diff, diff_sessions, merge
+
+
+def test_diff_and_apply_round_trip():
+    old = {'2024-05-01': {'a': {'elapsed': 1}, 'b': {'elapsed': 2}}}
+    new = {'2024-05-01': {'a': {'elapsed': 5}}, '2024-05-02': {'c': {'elapsed': 3}}}
+    upserts, removals = diff_sessions(old, new)
+    assert removals == [('2024-05-01', 'b')]
+    assert upserts == {'2024-05-01': {'a': {'elapsed': 5}}, '2024-05-02': {'c': {'elapsed': 3}}}
+    apply_diff(old, upserts, removals)
+    assert old == new
+
+
+def test_merge_keeps_both_sides():
+    base = {'sessions_by_date': {'d': {'x': {'elapsed': 1}}}, 'categories': {'Old': '#000000'}}
+    ours = {'sessions_by_date': {'d': {'x': {'elapsed': 1}, 'mine': {'elapsed': 2}}},
+            'categories': {}, 'theme': True}
+    theirs = {'sessions_by_date': {'d': {'theirs': {'elapsed': 3}}},
+              'categories': {'Old': '#000000', 'New': '#ffffff'}}
+    merged = merge(base, ours, theirs)
+    assert merged['sessions_by_date'] == {'d': {'mine': {'elapsed': 2}, 'theirs': {'elapsed': 3}}}
+    assert merged['categories'] == {'New': '#ffffff'}
+    assert merged['theme'] is True
+
+
+def test_concurrent_saves_do_not_clobber(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, '_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(storage, '_known', {})
+    path = storage.current_file()
+    watcher = FileWatcher(path)
+
+    first = storage.load_sessions()
+    first['sessions_by_date'] = {'2024-05-01': {'laptop': {'elapsed': 60}}}
+    storage.save_sessions(first)
+    assert watcher.changed()
+    assert not watcher.changed()
+
+    # a second instance that loaded before the first one saved
+    storage._known.clear()
+    second = {'sessions_by_date': {'2024-05-01': {'desktop': {'elapsed': 90}}},
+              'categories': {}, 'tasks': [], 'theme': False}
+    written = storage.save_sessions(second)
+    assert set(written['sessions_by_date']['2024-05-01']) == {'laptop', 'desktop'}
+
+    with open(path) as f:
+        on_disk = json.load(f)
+    assert set(on_disk['sessions_by_date']['2024-05-01']) == {'laptop', 'desktop'}
+    watcher.close()
+
+
+def test_merge_keeps_their_sync_metadata_and_tasks():
+    base = {'sessions_by_date': {}, 'sync': {'vv': {'laptop': 1}}, 'tasks': [{'name': 'a'}]}
+    theirs = {'sessions_by_date': {}, 'sync': {'vv': {'laptop': 1, 'phone': 3}},
+              'tasks': [{'name': 'a'}, {'name': 'synced'}]}
+    # a writer that never touched either key and still holds the old copy
+    stale = merge(base, dict(base, theme=False), theirs)
+    assert stale['sync'] == theirs['sync'] and stale['tasks'] == theirs['tasks']
+    assert stale['theme'] is False
+    # edits to tasks merge per task
+    ours = dict(base, tasks=[{'name': 'a', 'done': True}, {'name': 'mine'}])
+    assert merge(base, ours, theirs)['tasks'] == [
+        {'name': 'a', 'done': True}, {'name': 'synced'}, {'name': 'mine'}]
+
+
+def test_unreadable_file_is_moved_aside_not_overwritten(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, '_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(storage, '_known', {})
+    monkeypatch.setattr(storage, 'FORMAT', 'binary')
+    path = Path(storage.current_file())
+    path.write_bytes(b'not a session file')
+    assert storage.load_sessions()['sessions_by_date'] == {}
+    assert path.as_posix() not in storage._known
+
+    storage.save_sessions({'sessions_by_date': {'2024-05-01': {'a': {'elapsed': 1}}}})
+    [aside] = tmp_path.glob('*.unreadable')
+    assert aside.read_bytes() == b'not a session file'
+    assert list(storage.load_sessions()['sessions_by_date']['2024-05-01']) == ['a']
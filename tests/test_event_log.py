@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from event_log import EventLog, RECORD, START, PAUSE, RESUME, PHASE
+from timer_model import TimerModel
+
+
+def test_intervals_skip_pauses():
+    log = EventLog()
+    log.append(START, "work", 0, monotonic=10.0, wall=1000.0)
+    log.append(PAUSE, "work", 0, monotonic=70.0, wall=1060.0)
+    log.append(RESUME, "work", 0, monotonic=100.0, wall=1090.0)
+    log.append(PHASE, "break", 1, monotonic=130.0, wall=1120.0)
+    log.append(PAUSE, "break", 1, monotonic=150.0, wall=1140.0)
+    assert log.intervals("work") == [(1000.0, 1060.0), (1090.0, 1120.0)]
+    assert log.intervals("break") == [(1120.0, 1140.0)]
+    assert log.focused_seconds() == 90.0
+
+
+def test_round_trip_is_fixed_width():
+    log = EventLog()
+    log.append(START, "work", 0, monotonic=1.0, wall=2.0)
+    log.append(PAUSE, "work", 0, monotonic=3.0, wall=4.0)
+    data = log.to_bytes()
+    assert len(data) == 2 * RECORD.size
+    copy = EventLog.from_bytes(data)
+    assert list(copy) == list(log)
+    assert copy[-1].kind == PAUSE
+
+
+def test_model_emits_events():
+    model = TimerModel(work=1, short_break=1, long_break=1)
+    model.start()
+    model.tick()
+    model.stop()
+    model.start()
+    kinds = [ev.kind for ev in model.events]
+    assert kinds == [START, PHASE, PAUSE, RESUME]
+    assert model.events[1].mode == "break"
+
+
+def test_open_appends_and_drops_torn_tail(tmp_path):
+    path = tmp_path / "events.log"
+    log = EventLog.open(path)
+    log.append(START, "work", 0, monotonic=1.0, wall=100.0)
+    log.append(PAUSE, "work", 0, monotonic=61.0, wall=160.0)
+    log.close()
+    with open(path, "ab") as f:
+        f.write(b"\x00" * (RECORD.size // 2))
+
+    reopened = EventLog.open(path)
+    assert len(reopened) == 2
+    reopened.append(RESUME, "work", 0, monotonic=70.0, wall=170.0)
+    reopened.close()
+    assert path.stat().st_size == 3 * RECORD.size
+    assert EventLog.open(path)[-1].kind == RESUME
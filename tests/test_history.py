@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from history import Change, UndoStack
+
+
+def _state():
+    sessions = {
+        '2024-05-01': {
+            'a': {'elapsed': 60, 'category': 'Work'},
+            'b': {'elapsed': 30, 'category': 'Work'},
+        },
+    }
+    return sessions, {'Work': '#ff0000'}
+
+
+def test_undo_redo_delete_and_rename():
+    sessions, cats = _state()
+    stack = UndoStack()
+    entry = sessions['2024-05-01'].pop('a')
+    stack.record(Change('delete').session('2024-05-01', 'a', entry, None))
+
+    change, touched = stack.undo(sessions, cats)
+    assert change.label == 'delete' and touched == [('2024-05-01', 'a')]
+    assert sessions['2024-05-01']['a'] is entry
+    stack.redo(sessions, cats)
+    assert 'a' not in sessions['2024-05-01']
+
+
+def test_category_rename_stores_keys_not_records():
+    sessions, cats = _state()
+    original = {d: {n: dict(e) for n, e in s.items()} for d, s in sessions.items()}
+    stack = UndoStack()
+    cats['Deep'] = cats.pop('Work')
+    keys = []
+    for name, s in sessions['2024-05-01'].items():
+        s['category'] = 'Deep'
+        keys.append(('2024-05-01', name))
+    stack.record(Change('rename').category('Work', '#ff0000', None)
+                 .category('Deep', None, '#ff0000').field('category', 'Work', 'Deep', keys))
+
+    stack.undo(sessions, cats)
+    assert sessions == original and cats == {'Work': '#ff0000'}
+    assert not stack.undo(sessions, cats)[0]
+
+
+def test_budget_evicts_oldest_and_record_clears_redo():
+    stack = UndoStack(budget=400)
+    for i in range(10):
+        stack.record(Change(str(i)).category(str(i), None, '#000000'))
+    assert 0 < len(stack) < 10
+    sessions, cats = {}, {'9': '#000000'}
+    stack.undo(sessions, cats)
+    assert stack.can_redo
+    stack.record(Change('new'))
+    assert not stack.can_redo
+
+
+def test_size_counts_retained_values():
+    small = {'elapsed': 60, 'notes': ''}
+    large = {'elapsed': 60, 'notes': 'x' * 10000, 'intervals': [[0, 60]] * 100}
+    assert (Change('delete').session('d', 'a', large, None).size()
+            > Change('delete').session('d', 'a', small, None).size() + 10000)
+    stack = UndoStack(budget=20000)
+    stack.record(Change('1').session('d', 'a', large, None))
+    stack.record(Change('2').session('d', 'b', large, None))
+    assert len(stack) == 1
@@ -0,0 +1,50 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from live_state import LiveStateReader, LiveStateWriter, format_status
+from timer_model import TimerModel
+
+
+def test_reader_sees_published_state(tmp_path):
+    path = str(tmp_path / 'live.state')
+    writer = LiveStateWriter(path)
+    reader = LiveStateReader(path)
+    assert writer.publish('work', True, 600, pomo_count=2, streak=3, task='Write report', now=1000.0)
+    state = reader.read()
+    assert (state.mode, state.running, state.pomo_count, state.streak) == ('work', True, 2, 3)
+    assert state.remaining(now=1100.0) == 500
+    assert format_status(state, now=1100.0) == '\U0001F345 08:20 Write report'
+    # nothing changed, so the page is not rewritten
+    assert not writer.publish('work', True, 599, pomo_count=2, streak=3, task='Write report')
+    reader.close()
+    writer.close()
+
+
+def test_model_transitions_are_published(tmp_path):
+    path = str(tmp_path / 'live.state')
+    writer = LiveStateWriter(path)
+    model = TimerModel(work=1, short_break=5, long_break=5)
+    model.listeners.append(lambda event: writer.publish_model(model, task='é' * 40))
+    model.start()
+    model.tick()
+    model.stop()
+    state = LiveStateReader(path).read()
+    assert (state.mode, state.running, state.paused_remaining) == ('break', False, 5)
+    assert state.task == 'é' * 32
+    writer.close()
+
+
+def test_two_writers_share_the_page_counter(tmp_path):
+    import live_state
+    path = str(tmp_path / 'live.state')
+    tk, web = LiveStateWriter(path), LiveStateWriter(path)
+    reader = LiveStateReader(path)
+    tk.publish('work', True, 600, now=0.0)
+    web.publish('break', False, 300)
+    tk.publish('work', False, 500)
+    assert live_state.SEQ.unpack_from(reader._map, 0)[0] == 6
+    assert reader.read().paused_remaining == 500
+    reader.close()
+    tk.close()
+    web.close()
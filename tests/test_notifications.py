@@ -0,0 +1,58 @@
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from notifications import DesktopSink, Dispatcher
+
+
+def test_sinks_run_on_worker_thread():
+    seen = []
+    done = threading.Event()
+
+    def sink(note):
+        seen.append((note.event, threading.current_thread().name))
+        done.set()
+
+    dispatcher = Dispatcher([sink]).start()
+    dispatcher.notify('work_complete', 'Work complete')
+    assert done.wait(1)
+    dispatcher.close()
+    assert seen == [('work_complete', 'pomopad-notify')]
+
+
+def test_failing_sink_does_not_stop_others():
+    sent = []
+    done = threading.Event()
+
+    def broken(note):
+        raise RuntimeError('no daemon')
+
+    def stand_in(title, message):
+        sent.append((title, message))
+        done.set()
+
+    dispatcher = Dispatcher([broken, DesktopSink(send=stand_in)]).start()
+    dispatcher.notify('break_complete', 'Break over', 'Back to work')
+    assert done.wait(1)
+    dispatcher.close()
+    assert sent == [('Break over', 'Back to work')]
+
+
+def test_full_queue_drops_oldest_without_blocking():
+    dispatcher = Dispatcher(maxsize=2)
+    for i in range(5):
+        dispatcher.notify(f'e{i}', 'title')
+    assert dispatcher.dropped == 3
+    assert [dispatcher._queue.get_nowait().event for _ in range(2)] == ['e3', 'e4']
+
+
+def test_no_sound_sink_without_simpleaudio(monkeypatch):
+    import notifications
+    monkeypatch.setattr(sys, 'platform', 'linux')
+    # a None entry makes the import raise ImportError
+    monkeypatch.setitem(sys.modules, 'simpleaudio', None)
+    assert not notifications.sound_available()
+    dispatcher = notifications.default_dispatcher()
+    dispatcher.close()
+    assert not any(isinstance(s, notifications.SoundSink) for s in dispatcher.sinks)
@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from query import MemorySource, Query, QueryEngine
+
+
+SESSIONS = {
+    '2024-05-06': {
+        'Write report': {'elapsed': 1500, 'timestamp': None, 'notes': 'intro', 'color': '#123456'},
+        'Standup': {'elapsed': 600, 'timestamp': None, 'category': 'Work', 'notes': ''},
+    },
+    '2024-05-07': {
+        'Code review': {'elapsed': 900, 'timestamp': None, 'category': 'Work', 'notes': 'Parser'},
+    },
+    '2024-05-20': {
+        'Work': {'elapsed': 3000, 'category': 'Work', 'count': 4, 'rollup': True},
+    },
+}
+
+
+def test_group_and_measures():
+    engine = QueryEngine(MemorySource(SESSIONS))
+    assert engine.run(group_by='category', end='2024-05-07') == {'Uncategorised': 1500, 'Work': 1500}
+    assert engine.run(category='Work', group_by='week') == {'2024-W19': 1500, '2024-W21': 3000}
+    assert engine.run(category='Work', measure='count') == 6
+    assert engine.run(category='Work', measure='avg', start='2024-05-07') == 3900 / 5
+
+
+def test_record_filters_skip_rollups():
+    engine = QueryEngine(MemorySource(SESSIONS))
+    assert engine.run(notes='parser', group_by='name') == {'Code review': 900}
+    assert engine.run(task='Write report') == 1500
+    assert engine.run(name='r', group_by='day') == {'2024-05-06': 1500, '2024-05-07': 900}
+
+
+def test_results_are_cached_until_invalidated():
+    data = {d: dict(s) for d, s in SESSIONS.items()}
+    engine = QueryEngine(MemorySource(lambda: data))
+    q = Query(start='2024-05-07', end='2024-05-07')
+    assert engine.run(q) == 900
+    data['2024-05-07']['Extra'] = {'elapsed': 100}
+    assert engine.explain(q)['cached']
+    assert engine.run(q) == 900
+    engine.invalidate()
+    assert engine.run(q) == 1000
+
+
+def test_history_source_reads_other_months_from_disk(tmp_path, monkeypatch):
+    import json
+    from datetime import date
+    import storage
+    from query import HistorySource
+    (tmp_path / 'sessions_2000-01.json').write_text(json.dumps(
+        {'sessions_by_date': {'2000-01-31': {'old': {'elapsed': 600, 'category': 'Work'}}}}))
+    today = date.today().isoformat()
+    loaded = {today: {'new': {'elapsed': 60, 'category': 'Work'}}}
+    engine = QueryEngine(HistorySource(lambda: loaded, data_dir=str(tmp_path)))
+    assert engine.run(start='2000-01-01', group_by='day') == {'2000-01-31': 600, today: 60}
+    assert engine.run(start=today, end=today) == 60
+
+
+def test_record_queries_drill_into_archived_months(tmp_path):
+    import json
+    from datetime import datetime
+    from query import StorageSource
+    from retention import compact
+    (tmp_path / 'sessions_2024-01.json').write_text(json.dumps({'sessions_by_date': {
+        '2024-01-03': {'Write report': {'elapsed': 600, 'category': 'Work', 'notes': 'draft'}},
+    }}))
+    compact(str(tmp_path), keep_months=1, today=datetime(2024, 6, 10))
+    engine = QueryEngine(StorageSource(str(tmp_path)))
+    span = {'start': '2024-01-01', 'end': '2024-01-31'}
+    assert engine.run(group_by='name', **span) == {'Write report': 600}
+    assert engine.run(notes='draft', **span) == 600
+    # totals still come from the rollup
+    assert engine.run(group_by='category', **span) == {'Work': 600}
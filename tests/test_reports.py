@@ -0,0 +1,31 @@
+import json
+import sys
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from reports import generate
+
+
+def _user(root, name, sessions):
+    data_dir = root / name / '.pomopad'
+    data_dir.mkdir(parents=True)
+    with open(data_dir / 'sessions_2024-05.json', 'w') as f:
+        json.dump({'sessions_by_date': sessions, 'categories': {}, 'tasks': []}, f)
+    return str(root / name)
+
+
+def test_reports_per_user(tmp_path):
+    users = [
+        _user(tmp_path, 'alice', {'2024-05-30': {'a': {'elapsed': 600, 'category': 'Work'}},
+                                  '2024-05-01': {'old': {'elapsed': 999}}}),
+        _user(tmp_path, 'bob', {}),
+    ]
+    out = tmp_path / 'out'
+    results = sorted(generate(users, str(out), date(2024, 5, 31), workers=2, chart=False))
+    assert [(user, error) for user, _, error in results] == [('alice', None), ('bob', None)]
+    summary = json.loads((out / 'alice' / 'summary.json').read_text())
+    assert summary['total_seconds'] == 600
+    assert summary['by_category'] == {'Work': 600}
+    assert summary['by_day']['2024-05-30'] == 600 and len(summary['by_day']) == 7
+    assert json.loads((out / 'bob' / 'summary.json').read_text())['sessions'] == 0
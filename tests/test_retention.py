@@ -0,0 +1,46 @@
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from retention import compact, load_archive, load_rollups
+
+
+def _write_month(path, month):
+    data = {
+        'sessions_by_date': {
+            f'{month}-03': {
+                'a': {'elapsed': 600, 'category': 'Work', 'timestamp': None, 'notes': ''},
+                'b': {'elapsed': 300, 'category': 'Work', 'timestamp': None, 'notes': ''},
+                'c': {'elapsed': 120, 'timestamp': None, 'notes': '', 'color': '#123456'},
+            },
+        },
+        'categories': {'Work': '#ff0000'},
+        'tasks': [],
+        'theme': False,
+    }
+    with open(path / f'sessions_{month}.json', 'w') as f:
+        json.dump(data, f, indent=2)
+    return data
+
+
+def test_compacts_only_cold_months(tmp_path):
+    old = _write_month(tmp_path, '2024-01')
+    _write_month(tmp_path, '2024-05')
+    done = compact(str(tmp_path), keep_months=3, today=datetime(2024, 6, 10))
+    assert done == ['2024-01']
+    names = sorted(os.listdir(tmp_path))
+    assert names == ['rollup_2024-01.json', 'sessions_2024-01.json.gz', 'sessions_2024-05.json']
+    assert load_archive(str(tmp_path), '2024-01') == old
+
+
+def test_rollups_read_like_sessions(tmp_path):
+    _write_month(tmp_path, '2024-01')
+    compact(str(tmp_path), keep_months=1, codec='lzma', today=datetime(2024, 6, 10))
+    days = load_rollups(str(tmp_path), '2024-01-01', '2024-01-31')
+    work = days['2024-01-03']['Work']
+    assert (work['elapsed'], work['count'], work['color']) == (900, 2, '#ff0000')
+    assert days['2024-01-03']['Uncategorised']['category'] == ''
+    assert load_rollups(str(tmp_path), '2024-02-01', '2024-02-28') == {}
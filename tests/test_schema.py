@@ -0,0 +1,98 @@
+import io
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import schema
+from schema import Quarantine, iter_month, load, migrate, upgrade
+
+LEGACY = {
+    'sessions_by_date': {
+        '2024-05-01': {
+            'task': {'elapsed': 1500.4, 'timestamp': 1714550400, 'notes': 'n'},
+            'broken': {'elapsed': 'lots'},
+        },
+        '2024-05-02': {'quick': {'elapsed': 60, 'category': 'Work', 'notes': None}},
+    },
+    'categories': {'Work': '#ff0000', 'Bad': 3},
+    'tasks': [{'name': 'write'}, 'not a task'],
+    'theme': 'superhero',
+}
+
+
+def test_upgrades_v1_records_while_streaming():
+    raw = json.dumps(LEGACY, indent=2)
+    quarantine = Quarantine()
+    data = load(io.StringIO(raw), quarantine)
+    assert data == load(io.BytesIO(raw.encode()))
+    assert data['schema'] == schema.SCHEMA_VERSION
+    assert data['theme'] is True
+    assert data['sessions_by_date']['2024-05-01'] == {
+        'task': {'elapsed': 1500, 'timestamp': 1714550400.0, 'notes': 'n', 'category': ''},
+    }
+    assert data['sessions_by_date']['2024-05-02']['quick']['notes'] == ''
+    assert data['categories'] == {'Work': '#ff0000'}
+    assert data['tasks'] == [{'name': 'write'}]
+    assert sorted(e['where'] for e in quarantine.entries) == [
+        'categories/Bad', 'sessions_by_date/2024-05-01/broken', 'tasks']
+
+
+def test_small_chunks_and_range_filter():
+    raw = json.dumps(LEGACY)
+    # a tiny chunk size makes values straddle buffer refills
+    events = list(iter_month(io.StringIO(raw), chunk_size=3))
+    assert [e[2] for e in events if e[0] == 'session'] == ['task', 'quick']
+    data = load(io.StringIO(raw), start='2024-05-02', end='2024-05-02')
+    assert list(data['sessions_by_date']) == ['2024-05-02']
+
+
+def test_a_value_larger_than_the_buffer_is_read_in_growing_chunks():
+    class Counting(io.StringIO):
+        reads = 0
+
+        def read(self, size=-1):
+            self.reads += 1
+            return super().read(size)
+
+    tasks = [{'name': f'task {i}', 'note': 'x' * 40} for i in range(20000)]
+    f = Counting(json.dumps(dict(LEGACY, tasks=tasks)))
+    events = list(iter_month(f, chunk_size=1024))
+    assert [e[2] for e in events if e[:2] == ('key', 'tasks')] == [tasks]
+    # about 1.4 MB: doubling takes a dozen reads, fixed 1 KiB chunks ~1400
+    assert f.reads < 30
+
+
+def test_truncated_file_keeps_what_was_read():
+    raw = json.dumps(LEGACY)
+    cut = raw.index('"2024-05-02"') + 20
+    quarantine = Quarantine()
+    data = load(io.StringIO(raw[:cut]), quarantine)
+    assert list(data['sessions_by_date']) == ['2024-05-01']
+    assert quarantine.entries[-1]['reason'].startswith('unreadable')
+    assert quarantine.entries[-1]['value'] == raw[raw.index('"quick"'):cut]
+
+
+def test_migrate_matches_load_and_upgrade(tmp_path):
+    src, dst = tmp_path / 'old.json', tmp_path / 'new.json'
+    src.write_text(json.dumps(LEGACY))
+    assert migrate(str(src), str(dst)) == 2
+    migrated = json.loads(dst.read_text())
+    assert migrated == load(io.StringIO(src.read_text()))
+    assert migrated == upgrade(json.loads(src.read_text()))
+
+    quarantine = Quarantine(str(tmp_path / 'quarantine.jsonl'))
+    load(io.StringIO(src.read_text()), quarantine)
+    quarantine.save('old.json')
+    lines = (tmp_path / 'quarantine.jsonl').read_text().splitlines()
+    assert len(lines) == 3 and json.loads(lines[0])['file'] == 'old.json'
+
+
+def test_non_finite_numbers_are_quarantined():
+    raw = ('{"sessions_by_date": {"2024-05-01": {"inf": {"elapsed": Infinity},'
+           ' "nan": {"elapsed": 5, "timestamp": NaN}, "ok": {"elapsed": 5}}}}')
+    quarantine = Quarantine()
+    data = load(io.StringIO(raw), quarantine)
+    assert list(data['sessions_by_date']['2024-05-01']) == ['ok']
+    assert sorted(e['reason'] for e in quarantine.entries) == [
+        'elapsed is not finite', 'timestamp is not finite']
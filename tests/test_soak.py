@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from clock import VirtualClock
+from soak import VirtualScheduler, run_soak
+from timer_model import TimerModel
+
+
+def test_virtual_clock_drives_model_timestamps():
+    clock = VirtualClock(start=1000.0)
+    model = TimerModel(work=60, clock=clock)
+    model.start()
+    clock.advance(30)
+    model.stop()
+    assert model.start_timestamp == 1000.0
+    assert model.events.intervals('work') == [(1000.0, 1030.0)]
+
+
+def test_scheduler_runs_in_order_and_honours_cancel():
+    clock = VirtualClock(start=0.0)
+    scheduler = VirtualScheduler(clock)
+    seen = []
+    scheduler.after(2000, lambda: seen.append(('b', clock.time())))
+    job = scheduler.after(1000, lambda: seen.append(('cancelled', clock.time())))
+    scheduler.after(500, lambda: seen.append(('a', clock.time())))
+    scheduler.after_cancel(job)
+    scheduler.run_until(10.0)
+    assert seen == [('a', 0.5), ('b', 2.0)]
+    assert clock.time() == 10.0
+
+
+def test_short_soak_passes():
+    # wall-clock latency thresholds are for manual runs, not shared CI machines
+    report = run_soak(days=2, max_p99=None, max_slowdown=None)
+    assert report['failures'] == []
+    assert report['handlers']['_tick']['calls'] > 10000
+    assert report['max_pending'] <= 2
@@ -0,0 +1,147 @@
+import asyncio
+from datetime import date
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import storage
+from storage_service import StorageService, StorageThread, snapshot
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, '_DATA_DIR', str(tmp_path))
+    monkeypatch.setattr(storage, 'FORMAT', 'json')
+    monkeypatch.setattr(storage, '_known', {})
+    return tmp_path
+
+
+# saves go to this month's file, so records must fall inside it
+TODAY = date.today().isoformat()
+
+
+def _add(name, day=TODAY, elapsed=60):
+    def fn(data):
+        data['sessions_by_date'].setdefault(day, {})[name] = {'elapsed': elapsed, 'category': ''}
+    return fn
+
+
+def test_reads_are_shared_and_writes_batched(data_dir, monkeypatch):
+    loads, saves = [], []
+    real_load, real_save = storage.load_sessions, storage.save_sessions
+    monkeypatch.setattr(storage, 'load_sessions', lambda *a: loads.append(1) or real_load(*a))
+    monkeypatch.setattr(storage, 'save_sessions', lambda *a: saves.append(1) or real_save(*a))
+
+    async def scenario():
+        service = StorageService(flush_delay=0.05)
+        first, second = await asyncio.gather(service.load(), service.load())
+        assert first is second
+        await service.mutate(_add('a'))
+        await service.mutate(_add('b'))
+        assert saves == []
+        await asyncio.sleep(0.2)
+        assert saves == [1]
+        await service.close()
+
+    asyncio.run(scenario())
+    assert loads == [1]
+    assert set(real_load()['sessions_by_date'][TODAY]) == {'a', 'b'}
+
+
+def test_query_sees_unflushed_edits(data_dir):
+    async def scenario():
+        service = StorageService(flush_delay=10)
+        await service.mutate(_add('a', elapsed=60))
+        first = await service.query(start=TODAY, end=TODAY)
+        await service.mutate(_add('b', elapsed=30))
+        second, again = await asyncio.gather(
+            service.query(start=TODAY, end=TODAY),
+            service.query(start=TODAY, end=TODAY))
+        await service.close()
+        return first, second, again
+
+    assert asyncio.run(scenario()) == (60, 90, 90)
+
+
+def test_update_keeps_records_from_other_writers(data_dir):
+    storage.save_sessions({'sessions_by_date': {}, 'categories': {}})
+    thread = StorageThread(flush_delay=10)
+    seen = []
+    thread.service.listeners.append(lambda *diff: seen.append(diff))
+    try:
+        base = snapshot(thread.call(thread.service.load))
+        # another instance writes behind the service's back
+        other = storage.load_sessions()
+        _add('theirs')(other)
+        Path(storage.current_file()).write_text(json.dumps(other))
+
+        ours = snapshot(base)
+        _add('ours')(ours)
+        thread.call(thread.service.update, base, ours, True)
+    finally:
+        thread.close()
+
+    saved = storage.load_sessions()['sessions_by_date'][TODAY]
+    assert set(saved) == {'ours', 'theirs'}
+    upserts, removals, categories = seen[0]
+    assert set(upserts[TODAY]) == {'theirs'} and removals == []
+
+
+def test_day_comes_from_the_cache_or_its_own_month(data_dir, monkeypatch):
+    (data_dir / 'sessions_2000-01.json').write_text(json.dumps(
+        {'sessions_by_date': {'2000-01-01': {'old': {'elapsed': 60}}}}))
+
+    async def scenario():
+        service = StorageService(flush_delay=10)
+        # before the month is loaded, a day is read on its own
+        old = await service.day('2000-01-01')
+        await service.mutate(_add('a'))
+        today = await service.day(TODAY)
+        await service.close()
+        return old, today
+
+    saves = []
+    real_save = storage.save_sessions
+    monkeypatch.setattr(storage, 'save_sessions', lambda *a: saves.append(1) or real_save(*a))
+    old, today = asyncio.run(scenario())
+    assert set(old) == {'old'} and set(today) == {'a'}
+    # the unsaved edit was served from the cache; only close wrote it
+    assert saves == [1]
+
+
+def test_own_writes_are_not_reported_as_external(data_dir):
+    from coordination import FileWatcher
+    storage.save_sessions({'sessions_by_date': {}, 'categories': {}})
+    watcher = FileWatcher(storage.current_file())
+    thread = StorageThread(flush_delay=0.01)
+    thread.service.watchers.append(watcher)
+    try:
+        thread.call(thread.service.mutate, _add('ours'), True)
+        assert not watcher.changed()
+        other = storage.load_sessions()
+        _add('theirs')(other)
+        Path(storage.current_file()).write_text(json.dumps(other))
+        assert watcher.changed()
+    finally:
+        thread.close()
+        watcher.close()
+
+
+def test_month_follows_the_injected_clock(data_dir):
+    from datetime import datetime
+    from clock import VirtualClock
+
+    clock = VirtualClock(datetime(2024, 1, 15, 12).timestamp())
+
+    async def scenario():
+        service = StorageService(flush_delay=10, clock=clock)
+        await service.mutate(_add('a', day='2024-01-15'))
+        day = await service.day('2024-01-15')
+        await service.close()
+        return day
+
+    assert set(asyncio.run(scenario())) == {'a'}
+    assert (data_dir / 'sessions_2024-01.json').exists()
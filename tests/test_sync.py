@@ -0,0 +1,121 @@
+import socket
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from sync import DirectoryTransport, SyncEngine, exchange
+
+
+def _store(sessions=None, categories=None):
+    return {'sessions_by_date': sessions or {}, 'categories': categories or {},
+            'tasks': [], 'theme': False}
+
+
+def test_only_changes_are_sent_and_stores_converge():
+    laptop = SyncEngine(_store({'2024-05-01': {'a': {'elapsed': 60}}}), device='laptop')
+    desktop = SyncEngine(_store(categories={'Work': '#ff0000'}), device='desktop')
+    assert laptop.sync_with(desktop) == (1, 1)
+    assert laptop.data['sessions_by_date'] == desktop.data['sessions_by_date']
+
+    desktop.data['sessions_by_date']['2024-05-01']['b'] = {'elapsed': 30}
+    desktop.scan()
+    ops = desktop.changes_since(laptop.version_vector())
+    assert [op['v']['name'] for op in ops] == ['b']
+    laptop.apply(ops)
+    assert set(laptop.data['sessions_by_date']['2024-05-01']) == {'a', 'b'}
+    assert laptop.data['categories'] == {'Work': '#ff0000'}
+
+
+def test_rename_and_delete_follow_stable_ids():
+    laptop = SyncEngine(_store({'2024-05-01': {'a': {'elapsed': 60}, 'b': {'elapsed': 5}}}), device='laptop')
+    desktop = SyncEngine(_store(), device='desktop')
+    laptop.sync_with(desktop)
+
+    day = laptop.data['sessions_by_date']['2024-05-01']
+    day['renamed'] = day.pop('a')
+    del day['b']
+    laptop.sync_with(desktop)
+    assert list(desktop.data['sessions_by_date']['2024-05-01']) == ['renamed']
+
+
+def test_same_name_on_both_devices_keeps_both():
+    laptop = SyncEngine(_store({'2024-05-01': {'Focus': {'elapsed': 60}}}), device='laptop')
+    desktop = SyncEngine(_store({'2024-05-01': {'Focus': {'elapsed': 90}}}), device='desktop')
+    laptop.sync_with(desktop)
+    laptop.sync_with(desktop)
+    left = laptop.data['sessions_by_date']['2024-05-01']
+    right = desktop.data['sessions_by_date']['2024-05-01']
+    assert left == right
+    assert sorted(e['elapsed'] for e in left.values()) == [60, 90]
+
+
+def test_directory_and_socket_transports(tmp_path):
+    a = SyncEngine(_store({'2024-05-01': {'a': {'elapsed': 60}}}), device='a')
+    b = SyncEngine(_store(categories={'Work': '#ff0000'}), device='b')
+    shared = DirectoryTransport(str(tmp_path))
+    shared.sync(a)
+    shared.sync(b)
+    shared.sync(a)
+    shared.sync(b)
+    assert a.data['categories'] == {'Work': '#ff0000'}
+    assert 'a' in b.data['sessions_by_date']['2024-05-01']
+
+    b.data['categories']['Home'] = '#00ff00'
+    left, right = socket.socketpair()
+    result = {}
+    server = threading.Thread(target=lambda: result.update(b=exchange(b, right, False)))
+    server.start()
+    applied, sent = exchange(a, left, True)
+    server.join()
+    left.close()
+    right.close()
+    assert (applied, sent) == (1, 0)
+    assert a.data['categories']['Home'] == '#00ff00'
+
+
+def test_tasks_with_the_same_name_stay_apart():
+    tasks = [{'id': 'one', 'name': 'Email'}, {'id': 'two', 'name': 'Email', 'done': True}]
+    laptop = SyncEngine(dict(_store(), tasks=tasks), device='laptop')
+    desktop = SyncEngine(_store(), device='desktop')
+    laptop.sync_with(desktop)
+    assert desktop.data['tasks'] == tasks
+
+
+def test_state_outlives_the_month_and_old_records_are_not_deleted():
+    state = {}
+    march = SyncEngine(_store({'2024-03-31': {'a': {'elapsed': 60}}}), device='laptop', state=state)
+    peer = SyncEngine(_store(), device='desktop')
+    march.sync_with(peer)
+    assert 'sync' not in march.data
+
+    # after the rollover the engine covers only the new window
+    april = SyncEngine(_store({'2024-04-01': {'b': {'elapsed': 30}}}), state=state, since='2024-04-01')
+    assert april.device == 'laptop'
+    assert april.sync_with(peer) == (0, 1)
+    assert set(peer.data['sessions_by_date']) == {'2024-03-31', '2024-04-01'}
+
+
+def test_main_covers_the_previous_month(tmp_path, monkeypatch):
+    from datetime import date
+    import storage
+    import sync
+
+    monkeypatch.setattr(storage, '_known', {})
+    shared = str(tmp_path / 'shared')
+    for device in ('a', 'b'):
+        (tmp_path / device).mkdir()
+    monkeypatch.setattr(storage, '_DATA_DIR', str(tmp_path / 'a'))
+    storage.save_sessions(dict(_store({'2024-03-31': {'late': {'elapsed': 60}}})), month='2024-03')
+    today = date(2024, 4, 2)
+
+    def run(device):
+        monkeypatch.setattr(storage, '_DATA_DIR', str(tmp_path / device))
+        storage._known.clear()
+        assert sync.main([shared], today=today) == 0
+
+    for device in 'abab':
+        run(device)
+    assert 'late' in storage.load_sessions('2024-03')['sessions_by_date']['2024-03-31']
+    assert storage.load_sessions('2024-04')['sessions_by_date'] == {}
+    assert (tmp_path / 'b' / 'sync_state.json').exists()
@@ -0,0 +1,117 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+import task_store
+from task_store import TaskStore
+
+
+def test_indexes_follow_edits():
+    store = TaskStore([{'name': 'a', 'note': '', 'done': False},
+                       {'name': 'b', 'note': '', 'done': True}])
+    a, b = store.visible()
+    c = store.add('c', priority=2)
+    assert store.visible() == [a, b, c]
+    assert store.active() == [a, c] and store.done() == [b]
+    assert store.next_task() == c
+
+    store.toggle(c)
+    assert store.next_task() == a
+    assert store.position(c) == 2
+
+    assert store.archive_done() == [b, c]
+    assert store.visible() == [a] and store.archived() == [b, c]
+    assert len(store) == 3
+
+    store.record_focus(a, 1500, pomodoros=1)
+    store.record_focus(a, 300)
+    assert store.get(a)['focused'] == 1800 and store.get(a)['pomodoros'] == 1
+
+
+def test_journal_replays_and_compacts(tmp_path, monkeypatch):
+    store = TaskStore.open(tmp_path, seed=[{'name': 'seeded', 'note': '', 'done': False}])
+    seeded = store.visible()[0]
+    added = store.add('added')
+    store.toggle(seeded)
+    store.delete(added)
+    store.close()
+    # the snapshot was written once; later edits only appended lines
+    assert len((tmp_path / 'tasks.log').read_text().splitlines()) == 3
+
+    # a task without an id, from an older month file, matches by name
+    reopened = TaskStore.open(tmp_path, seed=[{'name': 'seeded'}])
+    assert [t['name'] for t in reopened.tasks()] == ['seeded']
+    assert reopened.get(seeded)['done'] is True
+
+    monkeypatch.setattr(task_store, 'COMPACT_AFTER', 2)
+    for _ in range(3):
+        reopened.toggle(seeded)
+    reopened.close()
+    # the first toggle pushed the log past the limit and folded it away
+    assert len((tmp_path / 'tasks.log').read_text().splitlines()) == 2
+    assert TaskStore.open(tmp_path).get(seeded)['done'] is False
+
+
+def test_torn_journal_line_is_skipped(tmp_path):
+    store = TaskStore.open(tmp_path)
+    tid = store.add('kept')
+    store.close()
+    with open(tmp_path / 'tasks.log', 'a') as f:
+        f.write('{"op":"put","task":{"id"')
+    reopened = TaskStore.open(tmp_path)
+    assert reopened.get(tid)['name'] == 'kept'
+    # the torn tail was folded away, so new lines do not land on it
+    other = reopened.add('later')
+    reopened.close()
+    assert TaskStore.open(tmp_path).get(other)['name'] == 'later'
+
+
+def test_month_file_tasks_are_folded_in(tmp_path):
+    store = TaskStore.open(tmp_path)
+    tid = store.add('local')
+    local = dict(store.get(tid))
+    store.close()
+    synced = {'id': 'peer', 'name': 'from a peer', 'order': 7}
+    newer = dict(local, note='edited elsewhere', updated=local['updated'] + 1)
+    older = dict(local, note='stale', updated=local['updated'] - 1)
+    reopened = TaskStore.open(tmp_path, seed=[synced, older])
+    assert reopened.get('peer')['name'] == 'from a peer'
+    assert reopened.get(tid)['note'] == ''
+    assert reopened.fold([newer]) == 1 and reopened.get(tid)['note'] == 'edited elsewhere'
+    reopened.close()
+
+
+def test_instances_share_the_journal(tmp_path, monkeypatch):
+    first = TaskStore.open(tmp_path)
+    second = TaskStore.open(tmp_path)
+    a = first.add('a')
+    b = second.add('b')
+    # second replayed first's line before appending its own, took the next
+    # order after it, and still reports the foreign op to its view
+    assert a in second
+    assert second.get(b)['order'] > second.get(a)['order']
+    assert second.visible() == [a, b] and second.refresh()
+    assert first.refresh() and b in first
+    assert not first.refresh()
+
+    # compaction by one instance must not drop the other's tasks
+    monkeypatch.setattr(task_store, 'COMPACT_AFTER', 1)
+    first.add('c')
+    second.add('d')
+    first.refresh()
+    assert {t['name'] for t in first.tasks()} == {'a', 'b', 'c', 'd'}
+    first.close()
+    second.close()
+    assert len(TaskStore.open(tmp_path)) == 4
+
+
+def test_updated_stamps_come_from_the_clock():
+    from clock import VirtualClock
+
+    clock = VirtualClock(1000.0)
+    store = TaskStore(clock=clock)
+    tid = store.add('a')
+    assert store.get(tid)['updated'] == 1000.0
+    clock.advance(5)
+    store.toggle(tid)
+    assert store.get(tid)['updated'] == 1005.0
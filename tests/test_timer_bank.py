@@ -0,0 +1,55 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from timer_bank import TimerBank
+
+
+def test_transitions_match_timer_model():
+    bank = TimerBank(clock=lambda: 0.0)
+    tid = bank.add(work=2, short_break=1, long_break=3)
+    bank.start(tid, now=0)
+    assert bank.remaining(tid, now=0.5) == 2
+    assert bank.advance(now=2) == [(tid, "work_complete")]
+    assert bank.mode(tid) == "break"
+    assert bank.remaining(tid, now=2) == 1
+    assert bank.advance(now=3) == [(tid, "break_complete")]
+    assert bank.mode(tid) == "work"
+    assert bank.next_deadline() == 5
+
+
+def test_stop_freezes_remaining_and_skips_stale_deadlines():
+    bank = TimerBank(clock=lambda: 0.0)
+    a = bank.add(work=10)
+    b = bank.add(work=5)
+    bank.start(a, now=0)
+    bank.start(b, now=0)
+    bank.stop(b, now=2)
+    assert bank.remaining(b, now=100) == 3
+    assert bank.advance(now=10) == [(a, "work_complete")]
+    bank.start(b, now=20)
+    assert bank.next_deadline() == 23
+
+
+def test_stop_settles_only_its_own_overdue_phase():
+    bank = TimerBank(clock=lambda: 0.0)
+    a = bank.add(work=5, short_break=10)
+    c = bank.add(work=8, short_break=5)
+    bank.start(a, now=0)
+    bank.start(c, now=0)
+    assert bank.stop(c, now=10) == [(c, "work_complete")]
+    assert bank.mode(c) == "break" and bank.remaining(c) == 3
+    # a's transition at 5 is still reported by advance, not swallowed
+    assert bank.mode(a) == "work"
+    assert bank.advance(now=10) == [(a, "work_complete")]
+    assert bank.stop(a, now=10) == []
+
+
+def test_long_break_every_fourth():
+    bank = TimerBank(clock=lambda: 0.0)
+    tid = bank.add(work=1, short_break=1, long_break=3)
+    bank.start(tid, now=0)
+    bank.advance(now=7)
+    assert bank.pomo_count(tid) == 4
+    assert bank.mode(tid) == "break"
+    assert bank.remaining(tid, now=7) == 3
@@ -2,6 +2,7 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from clock import VirtualClock
 from timer_model import TimerModel
 
 
@@ -32,3 +33,32 @@ def test_long_break_cycle():
             model.tick()
         assert model.state.mode == "work"
     assert model.pomo_count == 4
+
+
+def test_catch_up_after_sleeping_through_a_phase():
+    clock = VirtualClock(1000.0)
+    model = TimerModel(work=3, short_break=2, long_break=4, clock=clock)
+    model.start()
+    assert model.catch_up() == []
+    assert model.next_wakeup() == 1
+    assert model.next_wakeup(transitions_only=True) == 3
+
+    clock.advance(3)
+    assert model.catch_up() == ["work_complete"]
+    assert (model.state.mode, model.state.remaining) == ("break", 2)
+
+    clock.advance(2.5)
+    assert model.catch_up() == ["break_complete"]
+    assert model.next_wakeup() == 0.5
+
+
+def test_late_catch_up_logs_phases_when_they_were_due():
+    clock = VirtualClock(1000.0)
+    model = TimerModel(work=3, short_break=2, long_break=4, clock=clock)
+    model.start()
+    # the process slept through the whole work phase and the break
+    clock.advance(6.5)
+    assert model.catch_up() == ["work_complete", "break_complete"]
+    model.stop()
+    assert model.events.intervals("work") == [(1000.0, 1003.0), (1005.0, 1006.5)]
+    assert model.events.intervals("break") == [(1003.0, 1005.0)]
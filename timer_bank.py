@@ -0,0 +1,186 @@
+from array import array
+import heapq
+import math
+import time
+
+from timer_model import WORK_DURATION, BREAK_DURATION, LONG_BREAK_DURATION
+
+_WORK = 0
+_BREAK = 1
+_MODES = ("work", "break")
+
+
+class TimerBank:
+    """Many Pomodoro timers driven by one deadline heap.
+
+    Timer state lives in parallel arrays indexed by timer id. Running
+    timers keep an absolute deadline instead of a countdown, so nothing
+    has to be touched every second: ``remaining`` is computed on demand
+    and ``advance`` only does work for timers whose phase actually ends.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._work = array("d")
+        self._short = array("d")
+        self._long = array("d")
+        self._mode = array("b")
+        self._count = array("l")
+        self._running = array("b")
+        self._deadline = array("d")
+        self._left = array("d")
+        self._gen = array("l")
+        self._alive = array("b")
+        self._free = []
+        self._heap = []
+
+    def __len__(self):
+        return len(self._alive) - len(self._free)
+
+    def add(self, work=WORK_DURATION, short_break=BREAK_DURATION,
+            long_break=LONG_BREAK_DURATION) -> int:
+        if self._free:
+            tid = self._free.pop()
+            self._work[tid] = work
+            self._short[tid] = short_break
+            self._long[tid] = long_break
+            self._mode[tid] = _WORK
+            self._count[tid] = 0
+            self._running[tid] = 0
+            self._deadline[tid] = 0.0
+            self._left[tid] = work
+            self._gen[tid] += 1
+            self._alive[tid] = 1
+            return tid
+        tid = len(self._alive)
+        self._work.append(work)
+        self._short.append(short_break)
+        self._long.append(long_break)
+        self._mode.append(_WORK)
+        self._count.append(0)
+        self._running.append(0)
+        self._deadline.append(0.0)
+        self._left.append(work)
+        self._gen.append(0)
+        self._alive.append(1)
+        return tid
+
+    def remove(self, tid: int):
+        self._check(tid)
+        self._alive[tid] = 0
+        self._running[tid] = 0
+        self._gen[tid] += 1
+        self._free.append(tid)
+
+    def _check(self, tid):
+        if not (0 <= tid < len(self._alive) and self._alive[tid]):
+            raise KeyError(tid)
+
+    def start(self, tid: int, now: float = None):
+        self._check(tid)
+        if self._running[tid]:
+            return
+        now = self.clock() if now is None else now
+        self._running[tid] = 1
+        self._gen[tid] += 1
+        self._deadline[tid] = now + self._left[tid]
+        heapq.heappush(self._heap, (self._deadline[tid], self._gen[tid], tid))
+
+    def stop(self, tid: int, now: float = None):
+        """Pause ``tid`` and return the ``(tid, event)`` pairs it was still owed.
+
+        Only this timer's overdue transitions are applied; other timers
+        are left for :meth:`advance` to report.
+        """
+        self._check(tid)
+        if not self._running[tid]:
+            return []
+        now = self.clock() if now is None else now
+        events = []
+        while self._deadline[tid] <= now:
+            events.append((tid, self._transition(tid)))
+        self._left[tid] = max(0.0, self._deadline[tid] - now)
+        self._running[tid] = 0
+        # invalidate the pending heap entry
+        self._gen[tid] += 1
+        return events
+
+    def reset(self, tid: int):
+        self._check(tid)
+        self._running[tid] = 0
+        self._gen[tid] += 1
+        self._mode[tid] = _WORK
+        self._count[tid] = 0
+        self._left[tid] = self._work[tid]
+
+    def remaining(self, tid: int, now: float = None) -> int:
+        self._check(tid)
+        if self._running[tid]:
+            now = self.clock() if now is None else now
+            return max(0, math.ceil(self._deadline[tid] - now))
+        return math.ceil(self._left[tid])
+
+    def mode(self, tid: int) -> str:
+        self._check(tid)
+        return _MODES[self._mode[tid]]
+
+    def running(self, tid: int) -> bool:
+        self._check(tid)
+        return bool(self._running[tid])
+
+    def pomo_count(self, tid: int) -> int:
+        self._check(tid)
+        return self._count[tid]
+
+    def next_deadline(self):
+        """Return the earliest pending transition time, or ``None``."""
+        heap = self._heap
+        while heap:
+            deadline, gen, tid = heap[0]
+            if self._gen[tid] == gen and self._running[tid]:
+                return deadline
+            heapq.heappop(heap)
+        return None
+
+    def advance(self, now: float = None):
+        """Apply every transition due by ``now`` and return ``(tid, event)`` pairs."""
+        now = self.clock() if now is None else now
+        heap = self._heap
+        events = []
+        while heap and heap[0][0] <= now:
+            deadline, gen, tid = heapq.heappop(heap)
+            if self._gen[tid] != gen or not self._running[tid]:
+                continue
+            events.append((tid, self._transition(tid)))
+            heapq.heappush(heap, (self._deadline[tid], gen, tid))
+        return events
+
+    def _transition(self, tid):
+        """End ``tid``'s current phase at its deadline; return the event name."""
+        if self._mode[tid] == _WORK:
+            self._count[tid] += 1
+            self._mode[tid] = _BREAK
+            long_break = self._count[tid] % 4 == 0
+            duration = self._long[tid] if long_break else self._short[tid]
+            event = "work_complete"
+        else:
+            self._mode[tid] = _WORK
+            duration = self._work[tid]
+            event = "break_complete"
+        self._deadline[tid] += duration
+        return event
+
+    def run(self, on_event, sleep=time.sleep, until=None):
+        """Sleep until the next transition, dispatch it, repeat.
+
+        Returns when no timer is running or ``until`` has passed.
+        """
+        while True:
+            deadline = self.next_deadline()
+            if deadline is None or (until is not None and deadline > until):
+                return
+            delay = deadline - self.clock()
+            if delay > 0:
+                sleep(delay)
+            for tid, event in self.advance():
+                on_event(tid, event)
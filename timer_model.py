@@ -1,10 +1,15 @@
 from dataclasses import dataclass
-import time
+
+from clock import SYSTEM_CLOCK
+from event_log import EventLog, START, PAUSE, RESUME, PHASE, RESET
 
 WORK_DURATION = 25 * 60
 BREAK_DURATION = 5 * 60
 LONG_BREAK_DURATION = 15 * 60
 
+# a wakeup this close to a second boundary still counts as that second
+_EPSILON = 0.001
+
 
 @dataclass
 class TimerState:
@@ -17,31 +22,58 @@ class TimerModel:
     """Pure timer logic for the Pomodoro widget."""
 
     def __init__(self, work: int = WORK_DURATION, short_break: int = BREAK_DURATION,
-                 long_break: int = LONG_BREAK_DURATION):
+                 long_break: int = LONG_BREAK_DURATION, clock=SYSTEM_CLOCK, events=None):
+        self.clock = clock
         self.work = work
         self.short_break = short_break
         self.long_break = long_break
         self.state = TimerState(work, "work", False)
         self.pomo_count = 0
         self.start_timestamp = None
+        # pass EventLog.open(path) to keep the log across runs
+        self.events = events if events is not None else EventLog()
+        self.listeners = []
+        self._paused = False
+        # monotonic time of the last second accounted for by catch_up
+        self._tick_at = 0.0
+
+    def _log(self, kind, at=None):
+        # ``at`` is the monotonic time the event happened, if not now
+        mono, wall = self.clock.monotonic(), self.clock.time()
+        if at is not None:
+            mono, wall = at, wall - (mono - at)
+        event = self.events.append(kind, self.state.mode, self.pomo_count, mono, wall)
+        for listener in self.listeners:
+            listener(event)
 
     def start(self):
         if not self.state.running:
             self.state.running = True
+            self._log(RESUME if self._paused else START)
+            self._paused = False
+            self._tick_at = self.clock.monotonic()
             if self.state.mode == "work":
-                self.start_timestamp = time.time()
+                self.start_timestamp = self.clock.time()
 
     def stop(self):
-        self.state.running = False
+        if self.state.running:
+            self._paused = True
+            self.state.running = False
+            self._log(PAUSE)
 
     def reset(self):
+        self._paused = False
         self.state.running = False
         self.state.remaining = self.work
         self.state.mode = "work"
         self.pomo_count = 0
+        self._log(RESET)
 
-    def tick(self):
-        """Advance the timer by one second and return an event string."""
+    def tick(self, at=None):
+        """Advance the timer by one second and return an event string.
+
+        ``at`` is the monotonic time of that second, when it is logged late.
+        """
         if not self.state.running:
             return None
         if self.state.remaining > 0:
@@ -58,8 +90,30 @@ class TimerModel:
             self.state.mode = "work"
             self.state.remaining = self.work
             event = "break_complete"
+        self._log(PHASE, at)
         return event
 
+    def catch_up(self):
+        """Tick once for every whole second since the last tick; return the events.
+
+        Callers can sleep through a phase (e.g. while their window is
+        hidden) and still arrive at the right state.
+        """
+        events = []
+        now = self.clock.monotonic()
+        while self.state.running and now - self._tick_at >= 1 - _EPSILON:
+            self._tick_at += 1
+            # a late wakeup logs each phase change when it was due, not now
+            event = self.tick(at=self._tick_at)
+            if event:
+                events.append(event)
+        return events
+
+    def next_wakeup(self, transitions_only: bool = False) -> float:
+        """Seconds until the next tick is due, or the next phase change."""
+        ahead = self.state.remaining if transitions_only else 1
+        return max(0.0, self._tick_at + ahead - self.clock.monotonic())
+
     def elapsed(self) -> int:
         if self.state.mode == "work":
             return self.work - self.state.remaining
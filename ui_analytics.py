@@ -4,16 +4,7 @@ from tkinter import ttk, messagebox
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import matplotlib.pyplot as plt
 
-
-def aggregate(sessions_by_date, start_date, end_date):
-    total = {}
-    colors = {}
-    for date, sess in sessions_by_date.items():
-        if start_date <= date <= end_date:
-            for name, s in sess.items():
-                total[name] = total.get(name, 0) + s.get("elapsed", 0)
-                colors[name] = s.get("color", "#888888")
-    return total, colors
+from query import MemorySource, Query, execute
 
 
 def setup(frame):
@@ -40,53 +31,59 @@ def setup(frame):
     }
 
 
-def refresh(ctx, sessions_by_date):
-    end = datetime.now().date()
+def window(ctx, today=None):
+    """The ``(start, end)`` dates the charts cover, ending ``today``."""
+    end = today or datetime.now().date()
     if ctx["period_var"].get() == "Day":
         start = end
     elif ctx["period_var"].get() == "Week":
         start = end - timedelta(days=6)
     else:
         start = end - timedelta(days=29)
+    return start, end
+
+
+def refresh(ctx, engine, categories, today=None):
+    start, end = window(ctx, today)
 
-    totals, colors = aggregate(sessions_by_date, start.isoformat(), end.isoformat())
+    # compacted months only keep category totals, so the pie is by category
+    totals = engine.run(start=start.isoformat(), end=end.isoformat(), group_by="category")
     ctx["ax_cat"].clear()
     if totals:
         cats = list(totals.keys())
         mins = [totals[c] / 60 for c in cats]
-        ctx["ax_cat"].pie(mins, labels=cats, colors=[colors.get(c, "#888888") for c in cats])
+        ctx["ax_cat"].pie(mins, labels=cats, colors=[categories.get(c, "#888888") for c in cats])
     ctx["canvas_cat"].draw()
 
     ctx["ax_spark"].clear()
+    daily = engine.run(start=start.isoformat(), end=end.isoformat(), group_by="day")
     vals = []
     d = start
     while d <= end:
-        key = d.isoformat()
-        total = sum(
-            s.get("elapsed", 0) / 60 for s in sessions_by_date.get(key, {}).values()
-        )
-        vals.append(total)
+        vals.append(daily.get(d.isoformat(), 0) / 60)
         d += timedelta(days=1)
     ctx["ax_spark"].plot(range(len(vals)), vals, color="blue")
     ctx["ax_spark"].axis("off")
     ctx["canvas_spark"].draw()
 
 
-def show_stats(master, sessions_by_date, categories):
-    today = datetime.now().date()
-    data = sessions_by_date.get(today.isoformat(), {})
-    if not data:
+def show_stats(master, data, categories):
+    totals = execute(Query(group_by="name"), MemorySource({"today": data}))
+    if not totals:
         messagebox.showinfo("Stats", "No sessions recorded today")
         return
     fig, ax = plt.subplots(figsize=(4, 3))
-    cats = list(data.keys())
-    mins = [s.get("elapsed", 0) / 60 for s in data.values()]
-    colors = [s.get("color", "#888888") for s in data.values()]
+    cats = list(totals.keys())
+    mins = [totals[c] / 60 for c in cats]
+    colors = [data[c].get("color") or categories.get(data[c].get("category"), "#888888")
+              for c in cats]
     ax.bar(cats, mins, color=colors)
     ax.set_ylabel("Minutes")
     ax.set_title("Today")
     dialog = tk.Toplevel(master)
     dialog.title("Daily Stats")
+    # pyplot keeps every figure alive until it is closed explicitly
+    dialog.bind("<Destroy>", lambda e: plt.close(fig) if e.widget is dialog else None)
     canvas = FigureCanvasTkAgg(fig, master=dialog)
     canvas.draw()
     canvas.get_tk_widget().pack()
@@ -48,6 +48,36 @@ class SessionsPane(ttk.Frame):
                     self.listbox.insert(tk.END, name)
         self._show_details()
 
+    def _shows(self, data):
+        selected = self.filter_var.get()
+        return selected == 'All' or data.get('category', '') == selected
+
+    def update_rows(self, upserts, removals):
+        """Insert or delete only the rows a diff touches.
+
+        ``sessions_by_date`` must already have the diff applied; rows that
+        are already listed keep their place.
+        """
+        rows = list(self.listbox.get(0, tk.END))
+        gone = {name for date, name in removals}
+        for sessions in upserts.values():
+            for name, data in sessions.items():
+                if not self._shows(data):
+                    gone.add(name)
+                elif name not in rows:
+                    self.listbox.insert(tk.END, name)
+                    rows.append(name)
+        for index in reversed(range(len(rows))):
+            if rows[index] in gone and not self._listed(rows[index]):
+                self.listbox.delete(index)
+        self._show_details()
+
+    def _listed(self, name):
+        for sess in self.sessions_by_date.values():
+            if name in sess and self._shows(sess[name]):
+                return True
+        return False
+
     def _show_details(self, event=None):
         sel = self.listbox.curselection()
         if not sel: